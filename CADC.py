@@ -2,107 +2,19 @@ import sys
 from PyQt6.QtWidgets import (QApplication, QWidget, QProgressBar, QPushButton, 
                            QVBoxLayout, QMessageBox, QLineEdit, QComboBox, QLabel, 
                            QStyledItemDelegate, QGridLayout, QFileDialog, QInputDialog, QDialog,
-                           QStackedWidget, QHBoxLayout)
+                           QStackedWidget, QHBoxLayout, QListWidget, QAbstractItemView)
 from PyQt6 import QtWidgets
-from PyQt6.QtCore import pyqtSignal, Qt, QThread, QPropertyAnimation, QPoint, QEasingCurve, QRect, QParallelAnimationGroup, QTimer
+from PyQt6.QtCore import pyqtSignal, Qt, QThread, QObject, QFileSystemWatcher, QPropertyAnimation, QPoint, QEasingCurve, QRect, QParallelAnimationGroup, QTimer
 from PyQt6.QtGui import QValidator, QStandardItem, QTransform, QPixmap, QPainter, QPen, QColor
 import os
 import random
-from decimal import Decimal, getcontext
-import ast
-from pathlib import Path
+from decimal import Decimal
 import getpass
 import pyperclip
-import pyzipper
-import shutil
 import sys
-def get_application_path():
-    return Path(os.environ.get("RUN_CADC_PATH", ""))
-
-directory_path = get_application_path()
-folder_path = directory_path / "list_CADC"
-
-def check_folder_file():
-
-    if not folder_path.is_dir():
-        try:
-            folder_path.mkdir(parents=True, exist_ok=True)
-        except Exception as e:
-            pass
-    return folder_path
-
-class BaseEncodingClass:
-    def generate_encoding_map(self):
-        return {
-            "00": "A", "01": "B", "02": "C", "03": "D", "04": "E",
-            "05": "F", "06": "G", "07": "H", "08": "I", "09": "J",
-            "10": "K", "11": "L", "12": "M", "13": "N", "14": "O",
-            "15": "P", "16": "Q", "17": "R", "18": "S", "19": "T",
-            "20": "U", "21": "V", "22": "W", "23": "X", "24": "Y",
-            "25": "Z", "26": "AA", "27": "BB", "28": "CC", "29": "DD",
-            "30": "EE", "31": "FF", "32": "GG", "33": "HH", "34": "II",
-            "35": "JJ", "36": "KK", "37": "LL", "38": "MM", "39": "NN",
-            "40": "OO", "41": "PP", "42": "QQ", "43": "RR", "44": "SS",
-            "45": "TT", "46": "UU", "47": "VV", "48": "WW", "49": "XX",
-            "50": "YY", "51": "ZZ", "52": "ab", "53": "bc", "54": "cd",
-            "55": "de", "56": "ef", "57": "fg", "58": "gh", "59": "hi",
-            "60": "ij", "61": "jk", "62": "kl", "63": "lm", "64": "mn",
-            "65": "no", "66": "op", "67": "pq", "68": "qr", "69": "rs",
-            "70": "st", "71": "tu", "72": "uv", "73": "vw", "74": "wx",
-            "75": "xy", "76": "yz", "77": "12", "78": "23", "79": "34",
-            "80": "45", "81": "56", "82": "67", "83": "78", "84": "89",
-            "85": "90", "86": "@#", "87": "#$", "88": "$%", "89": "%^",
-            "90": "^^", "91": "**", "92": "((", "93": "))", "94": "++",
-            "95": "==", "96": "~~", "97": "!!", "98": "@@", "99": "##",
-            ".": "{", ",": "}"
-        }
-
-    def encode_numbers(self, number_string):
-        if len(number_string) % 2 != 0:
-            number_string = '0' + number_string
-            
-        # Разбиваем на пары цифр
-        pairs = [number_string[i:i+2] for i in range(0, len(number_string), 2)]
-        
-        # Кодируем каждую пару
-        result = []
-        for pair in pairs:
-            if pair in self.encoding_map:
-                result.append(self.encoding_map[pair])
-            else:
-                result.append('??')
-        
-        return ''.join(result)
-
-    def decode_numbers(self, encoded_string):
-        # Создаем обратную карту для двухсимвольных значений
-        reverse_map = {v: k for k, v in self.encoding_map.items()}
-        
-        result = []
-        i = 0
-        while i < len(encoded_string):
-            # Пробуем найти двухсимвольное значение
-            if i + 2 <= len(encoded_string):
-                chunk = encoded_string[i:i+2]
-                if chunk in reverse_map:
-                    result.append(reverse_map[chunk])
-                    i += 2
-                    continue
-            
-            # Пробуем найти односимвольное значение
-            chunk = encoded_string[i]
-            if chunk in reverse_map:
-                result.append(reverse_map[chunk])
-            i += 1
-        
-        # Объединяем результат
-        decoded = ''.join(result)
-        
-        # Убираем ведущий ноль, если он был добавлен
-        if decoded.startswith('0') and len(decoded) > 1:
-            decoded = decoded[1:]
-            
-        return decoded
+from cadc_core import BaseEncodingClass, folder_path, check_folder_file
+import cadc_core
+import cadc_metrics
 
 class CodingThread(QThread, BaseEncodingClass):
     status_button = pyqtSignal(str)
@@ -117,7 +29,6 @@ class CodingThread(QThread, BaseEncodingClass):
         self.combo = combo
         self.label_ok = label_ok
         self.encode_numbers = encode_numbers
-        self.encoding_map = self.generate_encoding_map()
 
     def run(self):
         try:
@@ -125,24 +36,12 @@ class CodingThread(QThread, BaseEncodingClass):
             file_path = folder_path
             file_name = self.combo.currentText()
             
-            with open(file_path / file_name, 'r') as file:
-                line = file.read()
-            line = line.replace("'", '"')
-            data_dict = ast.literal_eval(line)
-            
-            PK = str(data_dict.get('PK'))
-            PK2 = str(data_dict.get('PK2'))
-            prec = int(data_dict.get('prec'))
-            getcontext().prec = prec
-            key_len = int(data_dict.get('key_len'))
+            params = cadc_core.read_params(file_path / file_name)
             
-            OK = self.label_ok.text() or str(round(random.uniform(15.01, 999.99999), 5))
+            OK = self.label_ok.text() or cadc_core.generate_public_ok()
             self.status_signal_ok.emit(str(OK))
             
-            str_key = str(pow(Decimal(PK), Decimal(float(OK) + float(PK2))))
-            integer_part, fractional_part = str_key.split(".")
-            key = integer_part + fractional_part
-            self.public_key = key[prec - key_len: prec]
+            self.public_key = cadc_core.derive_public_key(params, OK)
 
             self.public_key_signal.emit(self.public_key)
             self.encoded_key_signal.emit(self.encode_numbers(self.public_key))
@@ -154,6 +53,53 @@ class CodingThread(QThread, BaseEncodingClass):
         except Exception as e:
             self.status_signal.emit(f"🤬 Ошибка! {str(e)}!")
 
+class ParamsWatcher(QObject):
+    # Следит за папкой list_CADC (QFileSystemWatcher — inotify в Linux).
+    # События склеиваются за DEBOUNCE_MS, после чего реестр параметров
+    # перечитывает список папки и рассылает разницу всем подписчикам
+    DEBOUNCE_MS = 200
+    changed = pyqtSignal(list, list, list)
+
+    def __init__(self, path):
+        super().__init__()
+        self.watcher = QFileSystemWatcher(self)
+        if os.path.isdir(path):
+            self.watcher.addPath(str(path))
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.DEBOUNCE_MS)
+        self.watcher.directoryChanged.connect(lambda _: self.timer.start())
+        self.timer.timeout.connect(self.refresh_now)
+
+    def refresh_now(self):
+        self.timer.stop()
+        added, removed, changed = cadc_core.params_registry.refresh()
+        if added or removed or changed:
+            self.changed.emit(added, removed, changed)
+
+_params_watcher = None
+
+def params_watcher():
+    # Один наблюдатель на приложение
+    global _params_watcher
+    if _params_watcher is None:
+        _params_watcher = ParamsWatcher(folder_path)
+    return _params_watcher
+
+def apply_params_diff(combo, added, removed):
+    # Точечное обновление списка без clear(): выбранный файл сохраняется
+    for name in removed:
+        index = combo.findText(name)
+        if index >= 0:
+            combo.removeItem(index)
+    for name in added:
+        if combo.findText(name) >= 0:
+            continue
+        position = 0
+        while position < combo.count() and combo.itemText(position) < name:
+            position += 1
+        combo.insertItem(position, name)
+
 class NoInputValidator(QValidator):
     def validate(self, input_text, pos):
         return QValidator.State.Invalid, input_text, pos
@@ -177,24 +123,16 @@ class ArchiveEncryptionThread(QThread):
         try:
             self.status_signal.emit("⌛ Генерация ключа для архива...")
             
-            with open(self.file_params, 'r') as file:
-                line = file.read()
-            line = line.replace("'", '"')
-            data_dict = ast.literal_eval(line)
-            
-            PK = float(data_dict['PK'])
-            PK2 = float(data_dict['PK2'])
-            prec = int(data_dict['prec'])
-            key_len = int(data_dict['key_len'])
+            params = cadc_core.read_params(self.file_params)
             
-            getcontext().prec = prec
+            PK = float(params['PK'])
+            PK2 = float(params['PK2'])
+            prec = params['prec']
+            key_len = params['key_len']
             
             OK = str(round(random.uniform(1, 999.99999), 5))
             
-            str_key = str(pow(Decimal(str(PK)), Decimal(str(float(OK) + PK2))))
-            integer_part, fractional_part = str_key.split(".")
-            key = integer_part + fractional_part
-            self.public_key = key[prec - key_len: prec]
+            self.public_key = cadc_core.derive_key(str(PK), Decimal(str(float(OK) + PK2)), prec, key_len)
             
             encoded_key = self.encode_numbers(self.public_key)
             
@@ -212,7 +150,6 @@ class ArchiveManager(QWidget, BaseEncodingClass):
         self.parent = parent
         self.selected_path = None
         self.archive_password = None
-        self.encoding_map = self.generate_encoding_map() 
         self.setup_ui()
         
     def create_down_arrow(self):
@@ -251,12 +188,15 @@ class ArchiveManager(QWidget, BaseEncodingClass):
         self.line_edit.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.combo.setFixedSize(378, 25)
         self.update_file_list()
+        params_watcher().changed.connect(self.on_params_changed)
         
         self.select_folder_button = QPushButton("Выбор папки для архивации")
         self.select_archive_button = QPushButton("Выбор архива для расшифровки")
         self.action_button = QPushButton("Заархивировать")
+        self.extract_button = QPushButton("Выборочная распаковка")
         
-        for button in [self.select_folder_button, self.select_archive_button, self.action_button]:
+        for button in [self.select_folder_button, self.select_archive_button, self.action_button,
+                       self.extract_button]:
             button.setFixedSize(378, 25)
         
         self.all_widgets = [
@@ -264,7 +204,8 @@ class ArchiveManager(QWidget, BaseEncodingClass):
             self.combo,
             self.select_folder_button,
             self.select_archive_button,
-            self.action_button
+            self.action_button,
+            self.extract_button
         ]
         
         layout.addWidget(self.path_label)
@@ -272,14 +213,17 @@ class ArchiveManager(QWidget, BaseEncodingClass):
         layout.addWidget(self.select_folder_button)
         layout.addWidget(self.select_archive_button)
         layout.addWidget(self.action_button)
+        layout.addWidget(self.extract_button)
         
         layout.addStretch()
         
         self.select_folder_button.clicked.connect(self.select_folder)
         self.select_archive_button.clicked.connect(self.select_archive)
         self.action_button.clicked.connect(self.process_archive)
+        self.extract_button.clicked.connect(self.extract_selected)
         
         self.action_button.hide()
+        self.extract_button.hide()
         
         self.setLayout(layout)
         self.updateWindowSize()
@@ -327,12 +271,12 @@ class ArchiveManager(QWidget, BaseEncodingClass):
     def update_file_list(self):
         self.combo.clear()
         try:
-            if os.path.exists(folder_path):
-                for filename in os.listdir(folder_path):
-                    if filename.endswith('.txt'):
-                        self.combo.addItem(filename)
+            self.combo.addItems(cadc_core.params_registry.names())
         except Exception as e:
             pass
+
+    def on_params_changed(self, added, removed, changed):
+        apply_params_diff(self.combo, added, removed)
             
     def select_folder(self):
         path = QFileDialog.getExistingDirectory(self, "Выберите папку для архивации")
@@ -341,6 +285,7 @@ class ArchiveManager(QWidget, BaseEncodingClass):
             self.path_label.setText(f"Выбрано: {os.path.basename(path)}")
             self.action_button.setText("Заархивировать")
             self.action_button.show()
+            self.extract_button.hide()
             self.updateWindowSize()
 
     def select_archive(self):
@@ -355,8 +300,64 @@ class ArchiveManager(QWidget, BaseEncodingClass):
             self.path_label.setText(f"Выбрано: {os.path.basename(path)}")
             self.action_button.setText("Разархивировать")
             self.action_button.show()
+            self.extract_button.show()
             self.updateWindowSize()
 
+    def extract_selected(self):
+        if not self.combo.currentText():
+            QMessageBox.warning(self, "Ошибка", "Выберите файл параметров!")
+            return
+
+        params_file = os.path.join(folder_path, self.combo.currentText())
+        try:
+            # Список — из центрального каталога, это быстро даже для больших архивов
+            entries = cadc_core.list_archive(self.selected_path, params_file)
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", str(e))
+            return
+
+        patterns = self.pick_members([entry['name'] for entry in entries if not entry['is_dir']])
+        if not patterns:
+            return
+        self.start_archive_thread('extract', params_file, patterns)
+
+    def pick_members(self, names):
+        # Диалог выбора: отмеченные файлы или glob-шаблон
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Выборочная распаковка")
+        dialog.setFixedSize(400, 400)
+
+        layout = QVBoxLayout()
+        pattern_edit = QLineEdit()
+        pattern_edit.setPlaceholderText("Шаблон, например *.txt (или выберите файлы)")
+        file_list = QListWidget()
+        file_list.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        file_list.addItems(names)
+        ok_button = QPushButton("Распаковать")
+        ok_button.clicked.connect(dialog.accept)
+
+        layout.addWidget(pattern_edit)
+        layout.addWidget(file_list)
+        layout.addWidget(ok_button)
+        dialog.setLayout(layout)
+        dialog.setStyleSheet("""
+            QDialog, QLineEdit, QListWidget, QPushButton {
+                background-color: black;
+                color: lightgrey;
+                border: 1px solid lightgrey;
+            }
+            QListWidget::item:selected {
+                background-color: #404040;
+            }
+        """)
+
+        if not dialog.exec():
+            return None
+        patterns = [item.text() for item in file_list.selectedItems()]
+        if pattern_edit.text().strip():
+            patterns.append(pattern_edit.text().strip())
+        return patterns
+
     def process_archive(self):
         if not self.selected_path:
             QMessageBox.warning(self, "Ошибка", "Сначала выберите папку или архив!")
@@ -366,37 +367,39 @@ class ArchiveManager(QWidget, BaseEncodingClass):
             QMessageBox.warning(self, "Ошибка", "Выберите файл параметров!")
             return
 
+        params_file = os.path.join(folder_path, self.combo.currentText())
+        mode = 'decrypt' if self.selected_path.endswith('.cp') else 'encrypt'
+        self.start_archive_thread(mode, params_file)
+
+    def set_buttons_enabled(self, enabled):
+        for button in [self.action_button, self.extract_button,
+                       self.select_folder_button, self.select_archive_button]:
+            button.setEnabled(enabled)
+
+    def start_archive_thread(self, mode, params_file, patterns=None):
         try:
-            params_file = os.path.join(folder_path, self.combo.currentText())
-            mode = 'decrypt' if self.selected_path.endswith('.cp') else 'encrypt'
-            
-            self.action_button.setEnabled(False)
-            self.select_folder_button.setEnabled(False)
-            self.select_archive_button.setEnabled(False)
+            self.set_buttons_enabled(False)
             
             self.archive_thread = ArchiveThread(
                 parent=self,
                 mode=mode,
                 selected_path=self.selected_path,
                 params_file=params_file,
-                encoding_map=self.encoding_map
+                patterns=patterns
             )
             
             self.archive_thread.status_signal.connect(self.update_status)
+            self.archive_thread.progress_signal.connect(self.update_progress)
             self.archive_thread.finished_signal.connect(self.handle_archive_result)
             self.archive_thread.start()
             
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Ошибка при подготовке к {mode}: {str(e)}")
-            self.action_button.setEnabled(True)
-            self.select_folder_button.setEnabled(True)
-            self.select_archive_button.setEnabled(True)
+            self.set_buttons_enabled(True)
 
     def handle_archive_result(self, success, message):
         try:
-            self.action_button.setEnabled(True)
-            self.select_folder_button.setEnabled(True)
-            self.select_archive_button.setEnabled(True)
+            self.set_buttons_enabled(True)
             
             if success:
                 QMessageBox.information(self, "Успех", message)
@@ -405,6 +408,9 @@ class ArchiveManager(QWidget, BaseEncodingClass):
         except Exception as e:
             pass
 
+    def update_progress(self, progress):
+        self.update_status(cadc_core.format_progress(progress))
+
     def update_status(self, message):
         try:
             if isinstance(self, FileViewer):
@@ -538,33 +544,9 @@ class ArchiveManager(QWidget, BaseEncodingClass):
             self.path_label.setText(f"Выбрано: {os.path.basename(path)}")
             self.action_button.setText("Заархивировать")
             self.action_button.show()
+            self.extract_button.hide()
             self.updateWindowSize()
 
-    def generate_encoding_map(self):
-        return {
-            "00": "A", "01": "B", "02": "C", "03": "D", "04": "E",
-            "05": "F", "06": "G", "07": "H", "08": "I", "09": "J",
-            "10": "K", "11": "L", "12": "M", "13": "N", "14": "O",
-            "15": "P", "16": "Q", "17": "R", "18": "S", "19": "T",
-            "20": "U", "21": "V", "22": "W", "23": "X", "24": "Y",
-            "25": "Z", "26": "AA", "27": "BB", "28": "CC", "29": "DD",
-            "30": "EE", "31": "FF", "32": "GG", "33": "HH", "34": "II",
-            "35": "JJ", "36": "KK", "37": "LL", "38": "MM", "39": "NN",
-            "40": "OO", "41": "PP", "42": "QQ", "43": "RR", "44": "SS",
-            "45": "TT", "46": "UU", "47": "VV", "48": "WW", "49": "XX",
-            "50": "YY", "51": "ZZ", "52": "ab", "53": "bc", "54": "cd",
-            "55": "de", "56": "ef", "57": "fg", "58": "gh", "59": "hi",
-            "60": "ij", "61": "jk", "62": "kl", "63": "lm", "64": "mn",
-            "65": "no", "66": "op", "67": "pq", "68": "qr", "69": "rs",
-            "70": "st", "71": "tu", "72": "uv", "73": "vw", "74": "wx",
-            "75": "xy", "76": "yz", "77": "12", "78": "23", "79": "34",
-            "80": "45", "81": "56", "82": "67", "83": "78", "84": "89",
-            "85": "90", "86": "@#", "87": "#$", "88": "$%", "89": "%^",
-            "90": "^^", "91": "**", "92": "((", "93": "))", "94": "++",
-            "95": "==", "96": "~~", "97": "!!", "98": "@@", "99": "##",
-            ".": "{", ",": "}"
-        }
-
     def show_success_dialog(self, public_key, OK):
         dialog = QDialog(self)
         dialog.setWindowTitle("Успех")
@@ -684,18 +666,9 @@ class FileCreator(QWidget):
             for line_edit in self.line_edits:
                 line_edit.clear()
             
-            # Обновляем список файлов во всех окнах
-            if isinstance(self.parent, MainWindow):
-                self.parent.file_viewer.update_file_list()
-                self.parent.archive_manager.update_file_list()
-            elif isinstance(self.parent, FileViewer):
-                self.parent.update_file_list()
-                if hasattr(self.parent.parent, 'archive_manager'):
-                    self.parent.parent.archive_manager.update_file_list()
-            elif isinstance(self.parent, ArchiveManager):
-                self.parent.update_file_list()
-                if hasattr(self.parent.parent, 'file_viewer'):
-                    self.parent.parent.file_viewer.update_file_list()
+            # Списки файлов во всех окнах обновит наблюдатель за list_CADC;
+            # не ждем его таймера, чтобы новый файл появился сразу
+            params_watcher().refresh_now()
             
             # Возвращаемся на главную страницу
             if hasattr(self.parent, 'handle_left_button'):
@@ -711,7 +684,6 @@ class MainWindow(QWidget, BaseEncodingClass):
         QWidget.__init__(self)
         self.setup_ui()
         self.animation_in_progress = False
-        self.encoding_map = self.generate_encoding_map()
         
     def setup_ui(self):
         self.setWindowTitle("CADC")
@@ -903,35 +875,6 @@ class MainWindow(QWidget, BaseEncodingClass):
         else:  # Если на странице действий
             self.slide_to_page(0, -1)  # Влево к главной
 
-    def generate_encoding_map(self):
-        return {
-            "00": "A", "01": "B", "02": "C", "03": "D", "04": "E",
-            "05": "F", "06": "G", "07": "H", "08": "I", "09": "J",
-            "10": "K", "11": "L", "12": "M", "13": "N", "14": "O",
-            "15": "P", "16": "Q", "17": "R", "18": "S", "19": "T",
-            "20": "U", "21": "V", "22": "W", "23": "X", "24": "Y",
-            "25": "Z", "26": "AA", "27": "BB", "28": "CC", "29": "DD",
-            "30": "EE", "31": "FF", "32": "GG", "33": "HH", "34": "II",
-            "35": "JJ", "36": "KK", "37": "LL", "38": "MM", "39": "NN",
-            "40": "OO", "41": "PP", "42": "QQ", "43": "RR", "44": "SS",
-            "45": "TT", "46": "UU", "47": "VV", "48": "WW", "49": "XX",
-            "50": "YY", "51": "ZZ", "52": "ab", "53": "bc", "54": "cd",
-            "55": "de", "56": "ef", "57": "fg", "58": "gh", "59": "hi",
-            "60": "ij", "61": "jk", "62": "kl", "63": "lm", "64": "mn",
-            "65": "no", "66": "op", "67": "pq", "68": "qr", "69": "rs",
-            "70": "st", "71": "tu", "72": "uv", "73": "vw", "74": "wx",
-            "75": "xy", "76": "yz", "77": "12", "78": "23", "79": "34",
-            "80": "45", "81": "56", "82": "67", "83": "78", "84": "89",
-            "85": "90", "86": "@#", "87": "#$", "88": "$%", "89": "%^",
-            "90": "^^", "91": "**", "92": "((", "93": "))", "94": "++",
-            "95": "==", "96": "~~", "97": "!!", "98": "@@", "99": "##",
-            ".": "{", ",": "}"
-        }
-        
-    def encode_numbers(self, number_string):
-        pairs = [number_string[i:i+2] for i in range(0, len(number_string), 2)]
-        return ''.join(self.encoding_map.get(pair, '?') for pair in pairs)
-
 class ScrollingLabel(QLabel):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -986,9 +929,9 @@ class FileViewer(QWidget, BaseEncodingClass):
     def __init__(self, folder_path):
         QWidget.__init__(self)
         self.folder_path = folder_path
-        self.encoding_map = self.generate_encoding_map()
         self.setup_ui()
         self.update_file_list()
+        params_watcher().changed.connect(self.on_params_changed)
         
     def setup_ui(self):
         self.setFixedSize(400, 200)
@@ -1128,13 +1071,13 @@ class FileViewer(QWidget, BaseEncodingClass):
     def update_file_list(self):
         try:
             self.combo.clear()
-            if os.path.exists(self.folder_path):
-                for filename in os.listdir(self.folder_path):
-                    if filename.endswith('.txt'):
-                        self.combo.addItem(filename)
+            self.combo.addItems(cadc_core.params_registry.names())
         except Exception as e:
             pass
 
+    def on_params_changed(self, added, removed, changed):
+        apply_params_diff(self.combo, added, removed)
+
     def create_file(self):
         self.window2 = FileCreator(self)
         self.window2.show()
@@ -1219,248 +1162,67 @@ class FileViewer(QWidget, BaseEncodingClass):
         except Exception as e:
             pass
 
-class ArchiveThread(QThread, BaseEncodingClass):
+class ArchiveThread(QThread):
     status_signal = pyqtSignal(str)
+    progress_signal = pyqtSignal(dict)
     finished_signal = pyqtSignal(bool, str)
     
-    def __init__(self, parent=None, mode='encrypt', selected_path=None, params_file=None, encoding_map=None):
+    def __init__(self, parent=None, mode='encrypt', selected_path=None, params_file=None, patterns=None):
         QThread.__init__(self, parent)
         self.mode = mode
+        self.patterns = patterns
         self.selected_path = selected_path
         self.params_file = params_file
         self.parent = parent
-        self.encoding_map = parent.encoding_map if parent else self.generate_encoding_map()
         self.public_key = None
         self.OK = None
+        self.metrics = None
         
     def run(self):
         try:
-            if self.mode == 'encrypt':
-                self.encrypt_archive()
-            else:
-                self.decrypt_archive()
+            # Замеры и профилирование включаются переменными окружения
+            # (см. cadc_metrics.instrument_job)
+            self.metrics = cadc_metrics.job_metrics_from_env()
+            with cadc_metrics.instrument_job(self.mode, self.metrics):
+                if self.mode == 'encrypt':
+                    self.encrypt_archive()
+                elif self.mode == 'extract':
+                    self.extract_archive()
+                else:
+                    self.decrypt_archive()
         except Exception as e:
             self.finished_signal.emit(False, str(e))
             
     def encrypt_archive(self): 
-        archive_path = None
         try:
-            if not self.selected_path or not os.path.exists(self.selected_path):
-                raise Exception("Выбранный путь не существует")
-
-            self.status_signal.emit("⌛ Генерация ключа...")
-            
-            with open(self.params_file, 'r') as file:
-                line = file.read()
-                
-            line = line.replace("'", '"')
-            data_dict = ast.literal_eval(line)
-            
-            self.PK = str(data_dict.get('PK'))
-            self.PK2 = str(data_dict.get('PK2'))
-            self.prec = int(data_dict.get('prec'))
-            getcontext().prec = self.prec
-            self.key_len = int(data_dict.get('key_len'))
-            
-            # Генерация OK
-            self.OK = round(random.uniform(15.01, 999.99999), 5)
-            ok_str = f"{self.OK:.5f}"  # Фиксируем формат сразу при создании
-            self.status_signal.emit(f"Сгенерированный OK: {ok_str}")
-            
-            # Генерация ключа
-            ok_decimal = Decimal(ok_str)
-            pk2_decimal = Decimal(str(float(self.PK2)))
-            str_key = str(pow(Decimal(self.PK), ok_decimal + pk2_decimal))
-            integer_part, fractional_part = str_key.split(".")
-            key = integer_part + fractional_part
-            self.public_key = key[self.prec - self.key_len : self.prec]
-
-            self.status_signal.emit("⌛ Подготовка архива...")
-            
-            # Форматируем и шифруем OK для названия архива
-            ok_str_for_encoding = ok_str.replace(".", "")
-            encoded_ok = self.encode_numbers(ok_str_for_encoding)
-            
-            # Используем ту же директорию, что и исходный файл/папка
-            source_dir = Path(self.selected_path)
-            if source_dir.is_file():
-                target_dir = source_dir.parent
-            else:
-                target_dir = source_dir.parent
-                
-            archive_path = target_dir / f"{encoded_ok}.cp"
-            
-            if os.path.exists(archive_path):
-                os.remove(archive_path)
-                
-            self.status_signal.emit("⌛ Создание архива...")
-            
-            # Создаем защищенный архив
-            with pyzipper.AESZipFile(archive_path, 'w', compression=pyzipper.ZIP_DEFLATED, encryption=pyzipper.WZ_AES) as zipf:
-                zipf.setpassword(str(self.public_key).encode())
-                zipf.setencryption(pyzipper.WZ_AES, nbits=256)
-                
-                if os.path.isfile(self.selected_path):
-                    self.status_signal.emit(f"⌛ Добавление файла {os.path.basename(self.selected_path)}...")
-                    arcname = os.path.basename(self.selected_path)
-                    zipf.write(self.selected_path, arcname)
-                else:
-                    # Подсчитываем общее количество файлов
-                    total_files = sum([len(files) for _, _, files in os.walk(source_dir)])
-                    processed_files = 0
-                    
-                    # Получаем имя главной папки
-                    base_folder_name = source_dir.name
-                    
-                    for root, dirs, files in os.walk(source_dir):
-                        # Создаем относительный путь, сохраняя структуру папок
-                        rel_path = os.path.relpath(root, source_dir.parent)
-                        
-                        # Добавляем пустые директории
-                        if not files and not dirs:
-                            empty_dir_path = os.path.join(rel_path, "")
-                            zipf.writestr(empty_dir_path, "")
-                        
-                        for file in files:
-                            processed_files += 1
-                            self.status_signal.emit(f"⌛ Архивация: {processed_files}/{total_files} файлов...")
-                            
-                            file_path = Path(root) / file
-                            try:
-                                arcname = os.path.join(rel_path, file)
-                                zipf.write(file_path, arcname)
-                            except Exception as e:
-                                self.status_signal.emit(f"⚠️ Пропуск файла {file}: {str(e)}")
-                                continue
-            
-            self.status_signal.emit(f"✅ Архив успешно создан: {encoded_ok}.cp")
-            self.finished_signal.emit(True, f"✅ Архив создан: {encoded_ok}.cp")
+            archive_path, self.OK, self.public_key = cadc_core.pack(
+                self.selected_path, self.params_file, status=self.status_signal.emit,
+                workers=os.cpu_count() or 1, progress=self.progress_signal.emit, metrics=self.metrics)
+            self.finished_signal.emit(True, f"✅ Архив создан: {archive_path.name}")
             
         except Exception as e:
-            if archive_path and os.path.exists(archive_path):
-                try:
-                    os.remove(archive_path)
-                except:
-                    pass
             self.finished_signal.emit(False, str(e))
             
     def decrypt_archive(self):
         try:
-            if not self.selected_path or not os.path.exists(self.selected_path):
-                raise Exception("Выбранный архив не существует")
-                
-            if not self.selected_path.endswith('.cp'):
-                raise Exception("Неверный формат архива")
-                
-            # Получаем зашифрованный OK из имени файла
-            encoded_ok = os.path.basename(self.selected_path).replace('.cp', '')
-            
-            self.status_signal.emit("⌛ Расшифровка архива...")
-            
-            # Расшифровываем OK
-            decoded_numbers = self.decode_numbers(encoded_ok)
-            if not decoded_numbers:
-                raise Exception("Не удалось расшифровать OK из имени файла")
-            
-            # Преобразуем расшифрованное число обратно в float с фиксированной точностью
-            try:
-                decoded_str = str(decoded_numbers)
-                if len(decoded_str) < 6:
-                    raise ValueError("Некорректная длина расшифрованного значения")
-                    
-                # Восстанавливаем OK с точным форматированием
-                ok_str = f"{decoded_str[:-5]}.{decoded_str[-5:]}"
-                self.OK = float(ok_str)
-            except ValueError as e:
-                raise Exception(f"Некорректный формат зашифрованного OK: {str(e)}")
-                
-            # Читаем параметры и генерируем ключ
-            with open(self.params_file, 'r') as file:
-                line = file.read()
-            line = line.replace("'", '"')
-            data_dict = ast.literal_eval(line)
-            
-            self.PK = str(data_dict.get('PK'))
-            self.PK2 = str(data_dict.get('PK2'))
-            self.prec = int(data_dict.get('prec'))
-            getcontext().prec = self.prec
-            self.key_len = int(data_dict.get('key_len'))
-            
-            # Используем тот же подход с Decimal как при шифровании
-            ok_decimal = Decimal(ok_str)
-            pk2_decimal = Decimal(str(float(self.PK2)))
-            str_key = str(pow(Decimal(self.PK), ok_decimal + pk2_decimal))
-            integer_part, fractional_part = str_key.split(".")
-            key = integer_part + fractional_part
-            self.public_key = key[self.prec - self.key_len : self.prec]
-            
-            # Используем директорию архива для распаковки
-            archive_dir = Path(self.selected_path).parent
-            
-            try:
-                with pyzipper.AESZipFile(self.selected_path, 'r') as zipf:
-                    try:
-                        zipf.setpassword(str(self.public_key).encode())
-                        
-                        # Проверяем возможность чтения файлов и считаем их количество
-                        file_list = zipf.namelist()
-                        if not file_list:
-                            raise Exception("Архив пуст")
-                            
-                        # Проверяем содержимое архива
-                        for item in file_list:
-                            try:
-                                zipf.read(item)
-                            except:
-                                raise Exception("Неверный ключ")
-                        
-                        self.status_signal.emit("⌛ Распаковка архива...")                    
-                        # Определяем путь для распаковки
-                        if len(file_list) > 1:
-                            # Создаем папку с именем архива (без .cp)
-                            archive_name = os.path.splitext(os.path.basename(self.selected_path))[0]
-                            extract_path = archive_dir / f"CADC_{archive_name}"
-                            
-                            # Если папка существует, добавляем номер
-                            counter = 1
-                            original_path = extract_path
-                            while os.path.exists(extract_path):
-                                extract_path = f"{original_path}_{counter}"
-                                counter += 1
-                            
-                            os.makedirs(extract_path)
-                            self.status_signal.emit(f"⌛ Создана папка для распаковки: {os.path.basename(extract_path)}")
-                        else:
-                            extract_path = archive_dir
-                        
-                        # Распаковываем файлы
-                        total_files = len(file_list)
-                        for index, item in enumerate(file_list, 1):
-                            self.status_signal.emit(f"⌛ Распаковка файлов: {index}/{total_files}")
-                            zipf.extract(item, extract_path)
-                                
-                    except (pyzipper.BadZipFile, KeyError):
-                        raise Exception("Неверный ключ или поврежденный архив")
-                        
-                success_message = "Архив успешно расшифрован и распакован"
-                if len(file_list) > 1:
-                    success_message += f" в папку {os.path.basename(extract_path)}"
-                else:
-                    success_message += f" в {os.path.basename(archive_dir)}"
-                    
-                self.finished_signal.emit(True, success_message)
-                
-            except Exception as e:
-                raise Exception(f"Ошибка при распаковке: {str(e)}")
+            extract_path, file_list = cadc_core.unpack(
+                self.selected_path, self.params_file, status=self.status_signal.emit,
+                progress=self.progress_signal.emit, metrics=self.metrics)
+            self.finished_signal.emit(True, cadc_core.unpack_message(extract_path, file_list))
                 
         except Exception as e:
             self.finished_signal.emit(False, str(e))
 
-    def encode_numbers(self, number_string):
-        return self.parent.encode_numbers(number_string) if self.parent else super().encode_numbers(number_string)
+    def extract_archive(self):
+        try:
+            extract_path, names = cadc_core.extract(
+                self.selected_path, self.params_file, self.patterns, status=self.status_signal.emit,
+                progress=self.progress_signal.emit, metrics=self.metrics)
+            self.finished_signal.emit(True, f"✅ Распаковано файлов: {len(names)} в папку "
+                                            f"{os.path.basename(extract_path)}")
 
-    def decode_numbers(self, encoded_string):
-        return self.parent.decode_numbers(encoded_string) if self.parent else super().decode_numbers(encoded_string)
+        except Exception as e:
+            self.finished_signal.emit(False, str(e))
 
 def main():
     check_folder_file()
@@ -0,0 +1,171 @@
+import asyncio
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+import cadc_core
+
+# Асинхронный фронтенд CADC для кода на asyncio.
+#
+#   job = cadc_async.pack(path, params_file)
+#   async for progress in job:      # снимки прогресса (см. cadc_core.Progress)
+#       ...
+#   archive_path, ok_str, key = await job
+#
+# Работа идет в ограниченном пуле потоков (zlib, AES и libmpdec отпускают
+# GIL), одновременно выполняется не больше limit задач — остальные ждут
+# своей очереди. Отмена задачи (job.cancel() или отмена ожидающей ее
+# корутины) срабатывает на ближайшем обновлении прогресса: они идут и
+# внутри файла (по кускам, не чаще ASYNC_PROGRESS_RATE раз в секунду), так
+# что крупный файл тоже прерывается. Исключение JobCancelled обрывает
+# задачу: pack и copy_archive удаляют незавершенный новый архив, unpack и
+# extract — созданную папку и недописанный файл, update и copy_archive
+# обрезают дописанное в существующий архив. Элементы, которые уже
+# сжимаются в потоках при workers > 1 (не больше PARALLEL_MAX_MEMBER
+# каждый), досчитываются.
+# Вычисление ключа прервать нельзя: оно досчитывается в фоне, но результат
+# отбрасывается. Задачи создаются внутри работающего цикла событий.
+# params_file, как и в консоли, — путь или имя файла из list_CADC.
+
+class JobCancelled(Exception):
+    pass
+
+# Прогресс без пропусков нужен редко: обновления все равно прореживаются
+ASYNC_PROGRESS_RATE = 10
+
+class Job:
+    def __init__(self, runner, func, args, kwargs, with_progress=True):
+        self._runner = runner
+        self._loop = asyncio.get_running_loop()
+        self._cancelled = threading.Event()
+        self._updates = asyncio.Queue()
+        if with_progress:
+            kwargs = dict(kwargs, progress=self._on_progress)
+            kwargs.setdefault('progress_rate', ASYNC_PROGRESS_RATE)
+        self._call = lambda: func(*args, **kwargs)
+        self._task = self._loop.create_task(self._run())
+
+    async def _run(self):
+        try:
+            async with self._runner.semaphore():
+                if self._cancelled.is_set():
+                    raise asyncio.CancelledError()
+                future = asyncio.wrap_future(self._runner.executor.submit(self._call))
+                try:
+                    return await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    # Слот освобождаем только когда поток действительно
+                    # остановился, иначе лимит перестанет что-то ограничивать
+                    self._cancelled.set()
+                    await asyncio.wait([future])
+                    if not future.cancelled():
+                        future.exception()
+                    raise
+        finally:
+            self._updates.put_nowait(None)
+
+    def _on_progress(self, snapshot):
+        # Вызывается в рабочем потоке
+        if self._cancelled.is_set():
+            raise JobCancelled("Операция отменена")
+        self._loop.call_soon_threadsafe(self._updates.put_nowait, snapshot)
+
+    def cancel(self):
+        self._cancelled.set()
+        self._task.cancel()
+
+    def done(self):
+        return self._task.done()
+
+    def __await__(self):
+        return self._task.__await__()
+
+    def __aiter__(self):
+        return self.progress()
+
+    async def progress(self):
+        # Снимки прогресса до завершения задачи
+        while True:
+            snapshot = await self._updates.get()
+            if snapshot is None:
+                return
+            yield snapshot
+
+class AsyncRunner:
+    def __init__(self, max_workers=None, limit=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.limit = limit or self.max_workers
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cadc")
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def semaphore(self):
+        # Свой семафор на каждый цикл событий
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.limit)
+        return semaphore
+
+    def pack(self, selected_path, params_file, **kwargs):
+        return Job(self, cadc_core.pack, (selected_path, _params(params_file)), kwargs)
+
+    def unpack(self, selected_path, params_file, **kwargs):
+        return Job(self, cadc_core.unpack, (selected_path, _params(params_file)), kwargs)
+
+    def extract(self, selected_path, params_file, patterns, **kwargs):
+        return Job(self, cadc_core.extract, (selected_path, _params(params_file), patterns), kwargs)
+
+    def update(self, selected_path, archive_path, params_file, **kwargs):
+        return Job(self, cadc_core.update, (selected_path, archive_path, _params(params_file)), kwargs)
+
+    def copy(self, sources, params_file, **kwargs):
+        if kwargs.get('target_params_file'):
+            kwargs['target_params_file'] = _params(kwargs['target_params_file'])
+        return Job(self, cadc_core.copy_archive, (sources, _params(params_file)), kwargs)
+
+    def derive_key(self, params_file, ok=None, archive=True):
+        # Результат: (OK, ключ); archive=False — ключ окна генерации
+        return Job(self, _derive_key, (_params(params_file), ok, archive), {}, with_progress=False)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+def _params(params_file):
+    # Путь или имя из list_CADC — так же, как в консоли
+    return cadc_core.resolve_params_file(str(params_file))
+
+def _derive_key(params_file, ok, archive):
+    params = cadc_core.read_params(params_file)
+    if archive:
+        ok = ok or cadc_core.generate_ok()
+        return ok, cadc_core.derive_archive_key(params, ok)
+    ok = ok or cadc_core.generate_public_ok()
+    return ok, cadc_core.derive_public_key(params, ok)
+
+_default_runner = None
+_default_lock = threading.Lock()
+
+def default_runner():
+    global _default_runner
+    with _default_lock:
+        if _default_runner is None:
+            _default_runner = AsyncRunner()
+        return _default_runner
+
+def pack(selected_path, params_file, **kwargs):
+    return default_runner().pack(selected_path, params_file, **kwargs)
+
+def unpack(selected_path, params_file, **kwargs):
+    return default_runner().unpack(selected_path, params_file, **kwargs)
+
+def extract(selected_path, params_file, patterns, **kwargs):
+    return default_runner().extract(selected_path, params_file, patterns, **kwargs)
+
+def update(selected_path, archive_path, params_file, **kwargs):
+    return default_runner().update(selected_path, archive_path, params_file, **kwargs)
+
+def copy(sources, params_file, **kwargs):
+    return default_runner().copy(sources, params_file, **kwargs)
+
+def derive_key(params_file, ok=None, archive=True):
+    return default_runner().derive_key(params_file, ok, archive)
@@ -0,0 +1,78 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pyzipper
+import cadc_core
+import cadc_keys
+
+# Пакетная архивация: каждая папка/файл упаковывается в отдельном процессе,
+# поэтому и генерация ключа, и DEFLATE+AES идут на всех ядрах.
+# Процессы пула живут всю пачку, так что ln(PK) в каждом считается один раз.
+
+def default_workers():
+    return os.cpu_count() or 1
+
+def expand_children(directory):
+    # Все папки и файлы внутри directory, кроме самих архивов .cp
+    return sorted(
+        entry.path for entry in os.scandir(directory)
+        if not entry.name.endswith('.cp') and not entry.name.startswith('.')
+    )
+
+def _init_worker(backend):
+    cadc_keys.set_backend(backend)
+
+def _pack_item(path, params_file, compression):
+    started = time.perf_counter()
+    result = {'path': path, 'archive': None, 'ok': None, 'bytes_in': 0, 'bytes_out': 0,
+              'files': 0, 'seconds': 0.0, 'error': None}
+    try:
+        archive_path, ok_str, _ = cadc_core.pack(path, params_file, overwrite=False, compression=compression)
+        result['archive'] = str(archive_path)
+        result['ok'] = ok_str
+        # Объем исходных данных берем из центрального каталога готового архива
+        with pyzipper.AESZipFile(archive_path, 'r') as zipf:
+            infos = zipf.infolist()
+        result['files'] = sum(1 for info in infos if not info.is_dir())
+        result['bytes_in'] = sum(info.file_size for info in infos)
+        result['bytes_out'] = os.path.getsize(archive_path)
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+def summarize(results, elapsed):
+    done = [r for r in results if not r['error']]
+    bytes_in = sum(r['bytes_in'] for r in done)
+    return {
+        'items': len(results),
+        'succeeded': len(done),
+        'failed': len(results) - len(done),
+        'files': sum(r['files'] for r in done),
+        'bytes_in': bytes_in,
+        'bytes_out': sum(r['bytes_out'] for r in done),
+        'seconds': round(elapsed, 3),
+        'items_per_sec': round(len(done) / elapsed, 3) if elapsed else 0.0,
+        'mb_per_sec': round(bytes_in / elapsed / 1e6, 3) if elapsed else 0.0,
+    }
+
+def pack_batch(paths, params_file, workers=None, status=None, compression=None):
+    # Возвращает (результаты в порядке paths, сводка)
+    workers = workers or default_workers()
+    params_file = str(params_file)
+    results = [None] * len(paths)
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cadc_keys.key_engine.backend,)) as pool:
+        futures = {pool.submit(_pack_item, str(path), params_file, compression): index
+                   for index, path in enumerate(paths)}
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results[futures[future]] = result
+            if status:
+                if result['error']:
+                    status(f"🤬 [{done}/{len(paths)}] {result['path']}: {result['error']}")
+                else:
+                    status(f"✅ [{done}/{len(paths)}] {result['path']} -> "
+                           f"{os.path.basename(result['archive'])} ({result['seconds']:.2f} с)")
+    return results, summarize(results, time.perf_counter() - started)
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+import cadc_codec
+import cadc_core
+import cadc_keys
+import cadc_zip
+
+# Замеры производительности и памяти CADC.
+#   cadc_bench.py memory [--sizes 16,512] [--buffer-size N]
+#   cadc_bench.py codec [--count N] [--digits 35]
+#   cadc_bench.py keys [--precs 4000,4500,5000] [--count N]
+#   cadc_bench.py archive [--shapes 1000x4,8x16384] [--prec 4000] [--workers N]
+#   cadc_bench.py suite [--quick] [-o отчет.json]
+#   cadc_bench.py mmap [--size-mb 2048] [--compressions stored,deflate:1] [--repeat 3]
+#   cadc_bench.py copy [--shapes 1000x4,8x16384] [--prec 4000]
+#
+# memory: распаковывает архивы с одним несжимаемым элементом разного размера
+# в отдельном процессе и сравнивает пиковый RSS. При потоковой распаковке
+# он не должен расти вместе с размером элемента.
+#
+# codec: пропускная способность кодека цифр (ключей в секунду) на ключах
+# заданной длины и на OK архивов — по одному и пакетом.
+#
+# keys: вывод ключа архива при разных prec (первый вызов — с вычислением
+# ln(PK), остальные — с ним из кеша движка), ключей в секунду.
+#
+# archive: pack и unpack синтетических деревьев. Форма дерева — ЧИСЛОxКБ;
+# содержимое файлов воспроизводимое (seed): половина случайных байтов,
+# половина нулей, чтобы сжатие работало как на обычных данных.
+#
+# mmap: архивация одного большого файла обычным чтением (zipf.write) и через
+# mmap (cadc_zip.input_chunks), каждый прогон в отдельном процессе.
+# Страницы отображения входят в RSS, поэтому пиковый RSS у mmap растет с
+# размером файла, хотя это страничный кеш, а не память процесса. Файл после
+# создания лежит в кеше ОС, так что это сравнение копирований, а не диска.
+#
+# copy: перенос всех элементов архива в новый архив (cadc_core.copy_archive)
+# с тем же ключом (байты как есть) и с новым ключом (перешифровка без
+# повторного сжатия) против распаковки и повторной архивации.
+#
+# suite: все замеры, кроме memory и mmap, каждый в отдельном процессе (пиковый RSS
+# не смешивается), в одном JSON-отчете — отчеты разных запусков можно
+# сравнивать построчно.
+
+BENCH_PK = '12345.6789'
+BENCH_PK2 = '2345.678'
+BENCH_PARAMS = "{'PK': '%s', 'PK2': '%s', 'prec': '%d', 'key_len': '35'}"
+MB = 1024 * 1024
+# Допустимый рост пикового RSS между самым маленьким и самым большим элементом
+RSS_TOLERANCE = 32 * MB
+
+_RSS_CHILD = """
+import resource, sys
+import cadc_core
+cadc_core.unpack(sys.argv[1], sys.argv[2], buffer_size=int(sys.argv[3]))
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+# ru_maxrss: килобайты в Linux, байты в macOS
+print(rss if sys.platform == 'darwin' else rss * 1024)
+"""
+
+_PACK_CHILD = """
+import resource, sys, time
+import cadc_core
+started = time.perf_counter()
+archive_path, _, _ = cadc_core.pack(sys.argv[1], sys.argv[2], compression=sys.argv[3],
+                                    mmap_input=sys.argv[4] == '1')
+elapsed = time.perf_counter() - started
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(archive_path)
+print(elapsed)
+print(rss if sys.platform == 'darwin' else rss * 1024)
+"""
+
+def write_params(directory, prec=4000):
+    params_file = Path(directory) / f"bench_params_{prec}.txt"
+    params_file.write_text(BENCH_PARAMS % (BENCH_PK, BENCH_PK2, prec))
+    return params_file
+
+def write_random_file(path, size, chunk=MB):
+    # Несжимаемые данные: элемент в архиве того же размера, что и файл
+    with open(path, 'wb') as file:
+        left = size
+        while left > 0:
+            file.write(os.urandom(min(chunk, left)))
+            left -= chunk
+
+def measure_unpack_rss(size, buffer_size, workdir):
+    # Пиковый RSS процесса, распаковавшего элемент размером size байт
+    source_dir = Path(workdir) / f"rss_{size}"
+    source_dir.mkdir()
+    write_random_file(source_dir / "payload.bin", size)
+    params_file = write_params(workdir)
+    archive_path, _, _ = cadc_core.pack(str(source_dir / "payload.bin"), params_file)
+    (source_dir / "payload.bin").unlink()
+    output = subprocess.run(
+        [sys.executable, "-c", _RSS_CHILD, str(archive_path), str(params_file), str(buffer_size)],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True)
+    return int(output.stdout.strip().splitlines()[-1])
+
+def write_mixed_file(path, size, seed=0):
+    # Чередование блоков случайных байтов и нулей по 1 МБ: сжимается примерно вдвое
+    noise = random.Random(seed).randbytes(MB)
+    zeros = bytes(MB)
+    with open(path, 'wb') as file:
+        written = 0
+        index = 0
+        while written < size:
+            block = (noise if index % 2 == 0 else zeros)[:size - written]
+            file.write(block)
+            written += len(block)
+            index += 1
+
+def bench_mmap(size_mb, compressions, repeat):
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        params_file = write_params(workdir)
+        source = Path(workdir) / "payload.bin"
+        write_mixed_file(source, size_mb * MB)
+        for compression in compressions:
+            for mode in ('read', 'mmap'):
+                best = None
+                for _ in range(repeat):
+                    output = subprocess.run(
+                        [sys.executable, "-c", _PACK_CHILD, str(source), str(params_file), compression,
+                         '1' if mode == 'mmap' else '0'],
+                        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True,
+                        check=True)
+                    archive_path, elapsed, rss = output.stdout.strip().splitlines()[-3:]
+                    os.remove(archive_path)
+                    if best is None or float(elapsed) < best[0]:
+                        best = (float(elapsed), int(rss))
+                rows.append({'compression': compression, 'input': mode, 'seconds': round(best[0], 3),
+                             'mb_per_sec': round(size_mb / best[0], 1),
+                             'peak_rss_mb': round(best[1] / MB, 1)})
+    return {'benchmark': 'mmap', 'size_mb': size_mb, 'repeat': repeat, 'rows': rows}
+
+def bench_memory(sizes_mb, buffer_size):
+    # Только проверка наличия: сам замер идет в дочернем процессе
+    if importlib.util.find_spec("resource") is None:
+        raise Exception("Замер RSS требует модуль resource (Unix)")
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size_mb in sizes_mb:
+            rss = measure_unpack_rss(size_mb * MB, buffer_size, workdir)
+            rows.append({'member_mb': size_mb, 'peak_rss_mb': round(rss / MB, 1)})
+    growth = (rows[-1]['peak_rss_mb'] - rows[0]['peak_rss_mb']) * MB
+    return {'benchmark': 'unpack_memory', 'buffer_size': buffer_size, 'rows': rows,
+            'rss_growth_mb': round(growth / MB, 1), 'flat': growth <= RSS_TOLERANCE}
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round((rss if sys.platform == 'darwin' else rss * 1024) / MB, 1)
+
+def _rate(func, count):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    return round(count / elapsed) if elapsed > 0 else None
+
+def bench_codec(count, digits):
+    rng = random.Random(0)
+    rows = []
+    workloads = (
+        ('key', [''.join(rng.choice('0123456789') for _ in range(digits)) for _ in range(count)]),
+        ('ok', [f"{rng.uniform(1, 3):.7f}".replace('.', '') for _ in range(count)]),
+    )
+    for name, numbers in workloads:
+        encoded = cadc_codec.encode_many(numbers)
+        rows.append({
+            'workload': name,
+            'digits': len(numbers[0]),
+            'encode_per_sec': _rate(lambda: [cadc_codec.encode_numbers(n) for n in numbers], count),
+            'decode_per_sec': _rate(lambda: [cadc_codec.decode_numbers(e) for e in encoded], count),
+            'decode_many_per_sec': _rate(lambda: cadc_codec.decode_many(encoded), count),
+        })
+    return {'benchmark': 'codec', 'count': count, 'rows': rows, 'peak_rss_mb': peak_rss_mb()}
+
+def bench_keys(precs, count, key_len=35, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for prec in precs:
+        engine = cadc_keys.key_engine
+        oks = [f"{rng.uniform(15.01, 999.99999):.5f}" for _ in range(count + 1)]
+        PK2 = BENCH_PK2
+        # Кеши ln(PK) общие для процесса: без сброса повторный замер того же
+        # prec (например, в suite) показал бы "теплый" первый ключ
+        cadc_keys.clear_ln_caches()
+        started = time.perf_counter()
+        engine.derive(BENCH_PK, cadc_keys.archive_exponent(oks[0], PK2, prec), prec, key_len)
+        first = time.perf_counter() - started
+        rate = _rate(lambda: [engine.derive(BENCH_PK, cadc_keys.archive_exponent(ok, PK2, prec), prec, key_len)
+                              for ok in oks[1:]], count)
+        rows.append({'prec': prec, 'key_len': key_len, 'first_ms': round(first * 1000, 2),
+                     'keys_per_sec': rate})
+    return {'benchmark': 'keys', 'backend': cadc_keys.key_engine.backend, 'count': count,
+            'rows': rows, 'peak_rss_mb': peak_rss_mb()}
+
+def parse_shapes(value):
+    # "1000x4,8x16384" -> [(1000, 4096), (8, 16777216)]
+    shapes = []
+    for shape in value.split(","):
+        count, size_kb = shape.lower().split("x")
+        shapes.append((int(count), int(size_kb) * 1024))
+    return shapes
+
+def write_tree(root, count, size, seed=0):
+    # Воспроизводимое дерево: по 100 файлов в подпапке
+    rng = random.Random(seed)
+    root = Path(root)
+    for index in range(count):
+        folder = root / f"d{index // 100:03d}"
+        folder.mkdir(parents=True, exist_ok=True)
+        noise = size // 2
+        (folder / f"f{index:05d}.bin").write_bytes(rng.randbytes(noise) + bytes(size - noise))
+    return count * size
+
+def bench_archive(shapes, prec, workers=1, compression=None, seed=0):
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        params_file = write_params(workdir, prec)
+        for count, size in shapes:
+            shape_dir = Path(workdir) / f"shape_{count}x{size}"
+            source_dir = shape_dir / "src"
+            total = write_tree(source_dir, count, size, seed)
+            # Ключ выводится внутри pack/unpack: кеш сбрасываем, чтобы он
+            # входил в каждый замер
+            cadc_keys.key_cache.clear()
+            started = time.perf_counter()
+            archive_path, _, _ = cadc_core.pack(str(source_dir), params_file, workers=workers,
+                                                compression=compression)
+            pack_time = time.perf_counter() - started
+            archive_size = os.path.getsize(archive_path)
+            cadc_keys.key_cache.clear()
+            started = time.perf_counter()
+            cadc_core.unpack(str(archive_path), params_file)
+            unpack_time = time.perf_counter() - started
+            rows.append({
+                'files': count,
+                'file_kb': size // 1024,
+                'total_mb': round(total / MB, 2),
+                'ratio': round(archive_size / total, 3) if total else None,
+                'pack_sec': round(pack_time, 3),
+                'pack_mb_per_sec': round(total / MB / pack_time, 2),
+                'pack_files_per_sec': round(count / pack_time, 1),
+                'unpack_sec': round(unpack_time, 3),
+                'unpack_mb_per_sec': round(total / MB / unpack_time, 2),
+                'unpack_files_per_sec': round(count / unpack_time, 1),
+            })
+            shutil.rmtree(shape_dir)
+    return {'benchmark': 'archive', 'prec': prec, 'workers': workers,
+            'compression': compression or 'deflate', 'rows': rows, 'peak_rss_mb': peak_rss_mb()}
+
+def bench_copy(shapes, prec, seed=0):
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        params_file = write_params(workdir, prec)
+        for count, size in shapes:
+            shape_dir = Path(workdir) / f"shape_{count}x{size}"
+            source_dir = shape_dir / "src"
+            total = write_tree(source_dir, count, size, seed)
+            archive_path, _, _ = cadc_core.pack(str(source_dir), params_file)
+            timings = {}
+            for mode in ('raw', 'reencrypt'):
+                target_dir = shape_dir / mode
+                target_dir.mkdir()
+                started = time.perf_counter()
+                cadc_core.copy_archive(str(archive_path), params_file, target=str(target_dir),
+                                       keep_key=mode == 'raw')
+                timings[mode] = time.perf_counter() - started
+            started = time.perf_counter()
+            extract_path, _ = cadc_core.unpack(str(archive_path), params_file)
+            cadc_core.pack(str(extract_path), params_file)
+            timings['unpack_pack'] = time.perf_counter() - started
+            row = {'files': count, 'file_kb': size // 1024, 'total_mb': round(total / MB, 2),
+                   'archive_mb': round(os.path.getsize(archive_path) / MB, 2)}
+            for mode, seconds in timings.items():
+                row[f'{mode}_sec'] = round(seconds, 3)
+                row[f'{mode}_mb_per_sec'] = round(total / MB / seconds, 2)
+            rows.append(row)
+            shutil.rmtree(shape_dir)
+    return {'benchmark': 'copy', 'prec': prec, 'rows': rows, 'peak_rss_mb': peak_rss_mb()}
+
+SUITE = {
+    'full': [
+        ['keys', '--precs', '4000,4250,4500,4750,5000', '--count', '20'],
+        ['codec', '--count', '100000'],
+        ['archive', '--shapes', '1000x4,100x256,4x65536', '--prec', '4000'],
+        ['archive', '--shapes', '1000x4,100x256,4x65536', '--prec', '5000'],
+        ['copy', '--shapes', '1000x4,4x65536', '--prec', '4000'],
+    ],
+    'quick': [
+        ['keys', '--precs', '4000,5000', '--count', '5'],
+        ['codec', '--count', '20000'],
+        ['archive', '--shapes', '200x4,4x4096', '--prec', '4000'],
+        ['copy', '--shapes', '200x4,4x4096', '--prec', '4000'],
+    ],
+}
+
+def run_suite(quick=False):
+    # Каждый замер — отдельный процесс: свой пиковый RSS и холодные кеши
+    reports = []
+    for args in SUITE['quick' if quick else 'full']:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__)] + args,
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True)
+        report = json.loads(output.stdout)
+        report['args'] = args
+        reports.append(report)
+    return {
+        'benchmark': 'suite',
+        'quick': quick,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'backend': cadc_keys.key_engine.backend,
+        'reports': reports,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="cadc_bench", description="Замеры производительности CADC")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    memory = subparsers.add_parser("memory", help="пиковый RSS распаковки в зависимости от размера элемента")
+    memory.add_argument("--sizes", default="16,512", help="размеры элементов в МБ через запятую")
+    memory.add_argument("--buffer-size", type=int, default=cadc_zip.EXTRACT_BUFFER_SIZE)
+
+    codec = subparsers.add_parser("codec", help="ключей в секунду для кодирования и декодирования")
+    codec.add_argument("--count", type=int, default=100000)
+    codec.add_argument("--digits", type=int, default=35, help="длина ключа в цифрах")
+
+    keys = subparsers.add_parser("keys", help="ключей архива в секунду в зависимости от prec")
+    keys.add_argument("--precs", default="4000,4500,5000", help="значения prec через запятую")
+    keys.add_argument("--count", type=int, default=20)
+    keys.add_argument("--key-len", type=int, default=35)
+
+    archive = subparsers.add_parser("archive", help="pack и unpack синтетических деревьев")
+    archive.add_argument("--shapes", default="1000x4,8x16384", help="формы деревьев ЧИСЛОxКБ через запятую")
+    archive.add_argument("--prec", type=int, default=4000)
+    archive.add_argument("-j", "--workers", type=int, default=1)
+    archive.add_argument("-c", "--compression", help="спецификация сжатия, как в cadc_cli pack")
+
+    mmap_bench = subparsers.add_parser("mmap", help="архивация большого файла: обычное чтение и mmap")
+    mmap_bench.add_argument("--size-mb", type=int, default=2048)
+    mmap_bench.add_argument("--compressions", default="stored,deflate:1",
+                            help="спецификации сжатия через запятую")
+    mmap_bench.add_argument("--repeat", type=int, default=3, help="прогонов на режим (берется лучший)")
+
+    copy = subparsers.add_parser("copy", help="копирование между архивами: как есть, с перешифровкой, "
+                                              "против unpack + pack")
+    copy.add_argument("--shapes", default="1000x4,8x16384", help="формы деревьев ЧИСЛОxКБ через запятую")
+    copy.add_argument("--prec", type=int, default=4000)
+
+    suite = subparsers.add_parser("suite", help="все замеры, кроме memory и mmap, в одном отчете")
+    suite.add_argument("--quick", action="store_true", help="короткий прогон")
+    suite.add_argument("-o", "--output", help="сохранить отчет в файл")
+
+    args = parser.parse_args(argv)
+    if args.command == "memory":
+        sizes = sorted(int(size) for size in args.sizes.split(","))
+        report = bench_memory(sizes, args.buffer_size)
+        print(json.dumps(report, ensure_ascii=False, indent=1))
+        return 0 if report['flat'] else 1
+    if args.command == "codec":
+        report = bench_codec(args.count, args.digits)
+    elif args.command == "keys":
+        report = bench_keys([int(prec) for prec in args.precs.split(",")], args.count, args.key_len)
+    elif args.command == "mmap":
+        report = bench_mmap(args.size_mb, args.compressions.split(","), args.repeat)
+    elif args.command == "archive":
+        report = bench_archive(parse_shapes(args.shapes), args.prec, args.workers, args.compression)
+    elif args.command == "copy":
+        report = bench_copy(parse_shapes(args.shapes), args.prec)
+    else:
+        report = run_suite(args.quick)
+        if args.output:
+            Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=1))
+    print(json.dumps(report, ensure_ascii=False, indent=1))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
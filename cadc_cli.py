@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import sys
+import cadc_codec
+import cadc_core
+import cadc_keys
+import cadc_batch
+import cadc_metrics
+import cadc_zip
+
+# Консольный вход CADC без Qt:
+#   cadc_cli.py derive <параметры> [--ok OK] [--archive]
+#   cadc_cli.py derive-batch <параметры> [--count N | --ok OK...] [--save] [--json]
+#   cadc_cli.py pack <папка|файл> <параметры> [--workers N] [--compression auto]
+#   cadc_cli.py unpack <архив.cp> <параметры>
+#   cadc_cli.py update <папка|файл> <архив.cp> <параметры> [--workers N]
+#   cadc_cli.py list <архив.cp> [параметры] [--json]
+#   cadc_cli.py extract <архив.cp> <параметры> <шаблон|путь...> [-o ПАПКА]
+#   cadc_cli.py pack-batch <параметры> <пути...> [--children ПАПКА] [--workers N]
+#   cadc_cli.py copy <параметры> <архивы.cp...> [-o АРХИВ.cp|ПАПКА] [--keep-key] [-p ШАБЛОН]
+#   cadc_cli.py verify-keys [--corpus файл]
+#   cadc_cli.py verify-codec [--samples N]
+#   cadc_cli.py params [--json] [--save-index]
+#
+# Общие ключи замеров (до команды): --metrics ФАЙЛ — JSON с временем стадий
+# и счетчиками задачи, --profile ФАЙЛ — статистика cProfile (pstats),
+# --tracemalloc — пик памяти и места выделения в метриках (там же — попадания
+# в кеш ключей). --key-cache-size N и --key-cache-ttl СЕКУНДЫ настраивают
+# кеш ключей (по умолчанию — CADC_KEY_CACHE_SIZE / CADC_KEY_CACHE_TTL).
+
+def status_printer(quiet):
+    if quiet:
+        return None
+    return lambda message: print(message, file=sys.stderr)
+
+def cmd_derive(args):
+    with cadc_metrics.stage(args.job_metrics, 'params'):
+        params = cadc_core.read_params(cadc_core.resolve_params_file(args.params))
+    with cadc_metrics.stage(args.job_metrics, 'key'):
+        if args.archive:
+            OK = args.ok or cadc_core.generate_ok()
+            key = cadc_core.derive_archive_key(params, OK)
+        else:
+            OK = args.ok or cadc_core.generate_public_ok()
+            key = cadc_core.derive_public_key(params, OK)
+    print(f"OK={OK}")
+    print(f"key={key}")
+    print(f"encoded={cadc_core.codec.encode_numbers(key)}")
+
+def cmd_derive_batch(args):
+    params_file = cadc_core.resolve_params_file(args.params)
+    with cadc_metrics.stage(args.job_metrics, 'params'):
+        params = cadc_core.read_params(params_file)
+    oks = list(args.ok or [])
+    while len(oks) < args.count:
+        oks.append(cadc_core.generate_ok())
+    if not oks:
+        raise Exception("Не задано ни одного OK")
+    with cadc_metrics.stage(args.job_metrics, 'key'):
+        keys = cadc_core.derive_archive_keys(params, oks, save=args.save, status=status_printer(args.quiet))
+    rows = [{'OK': ok_str, 'key': key, 'archive': f"{cadc_core.ok_to_archive_name(ok_str)}.cp"}
+            for ok_str, key in keys.items()]
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=1))
+        return
+    for row in rows:
+        print(f"{row['OK']}\t{row['archive']}\t{row['key']}")
+
+def cmd_pack(args):
+    params_file = cadc_core.resolve_params_file(args.params)
+    archive_path, ok_str, _ = cadc_core.pack(args.path, params_file, status=status_printer(args.quiet),
+                                             workers=args.workers, compression=args.compression,
+                                             progress_rate=args.progress_rate, dedup=args.dedup,
+                                             metrics=args.job_metrics, mmap_input=args.mmap)
+    print(archive_path)
+
+def cmd_unpack(args):
+    params_file = cadc_core.resolve_params_file(args.params)
+    extract_path, file_list = cadc_core.unpack(args.archive, params_file, status=status_printer(args.quiet),
+                                               buffer_size=args.buffer_size,
+                                               progress_rate=args.progress_rate, metrics=args.job_metrics)
+    print(extract_path)
+
+def cmd_list(args):
+    params_file = cadc_core.resolve_params_file(args.params) if args.params else None
+    entries = cadc_core.list_archive(args.archive, params_file)
+    if args.json:
+        print(json.dumps(entries, ensure_ascii=False, indent=1))
+        return
+    for entry in entries:
+        suffix = f" -> {entry['duplicate_of']}" if entry['duplicate_of'] else ""
+        print(f"{entry['size']:>12}  {entry['date_time']}  {entry['name']}{suffix}")
+
+def cmd_extract(args):
+    params_file = cadc_core.resolve_params_file(args.params)
+    extract_path, names = cadc_core.extract(args.archive, params_file, args.patterns,
+                                            extract_path=args.output, status=status_printer(args.quiet),
+                                            buffer_size=args.buffer_size, progress_rate=args.progress_rate,
+                                            metrics=args.job_metrics)
+    print(extract_path)
+
+def cmd_update(args):
+    params_file = cadc_core.resolve_params_file(args.params)
+    summary = cadc_core.update(args.path, args.archive, params_file, status=status_printer(args.quiet),
+                               workers=args.workers, compression=args.compression,
+                               compact_ratio=args.compact_ratio, progress_rate=args.progress_rate,
+                               metrics=args.job_metrics, mmap_input=args.mmap)
+    print(json.dumps(summary, ensure_ascii=False))
+
+def cmd_copy(args):
+    params_file = cadc_core.resolve_params_file(args.params)
+    target_params_file = cadc_core.resolve_params_file(args.target_params) if args.target_params else None
+    target_path, summary = cadc_core.copy_archive(args.archives, params_file, target=args.output,
+                                                  patterns=args.patterns, target_params_file=target_params_file,
+                                                  keep_key=args.keep_key, status=status_printer(args.quiet),
+                                                  progress_rate=args.progress_rate, metrics=args.job_metrics)
+    print(target_path)
+    print(json.dumps(summary, ensure_ascii=False))
+
+def cmd_pack_batch(args):
+    paths = list(args.paths)
+    for directory in args.children or []:
+        paths.extend(cadc_batch.expand_children(directory))
+    if not paths:
+        raise Exception("Не выбрано ни одной папки или файла")
+    params_file = cadc_core.resolve_params_file(args.params)
+    results, summary = cadc_batch.pack_batch(paths, params_file, workers=args.workers,
+                                             status=status_printer(args.quiet),
+                                             compression=args.compression)
+    if args.json:
+        print(json.dumps({'results': results, 'summary': summary}, ensure_ascii=False, indent=1))
+    else:
+        for result in results:
+            print(f"{result['path']}\t{result['archive'] or 'ERROR: ' + result['error']}")
+        print(f"Итого: {summary['succeeded']}/{summary['items']} за {summary['seconds']} с, "
+              f"{summary['mb_per_sec']} МБ/с, {summary['items_per_sec']} архивов/с")
+    if summary['failed']:
+        return 1
+
+def cmd_params(args):
+    registry = cadc_core.params_registry
+    params = registry.all()
+    if args.save_index:
+        count = registry.save_index()
+        print(f"✅ Индекс сохранен: {count} файлов", file=sys.stderr)
+    if args.json:
+        print(json.dumps(params, ensure_ascii=False, indent=1))
+        return
+    for name, values in params.items():
+        print(f"{name}\tprec={values['prec']}\tkey_len={values['key_len']}")
+
+def cmd_verify_keys(args):
+    mismatches = cadc_keys.verify_key_corpus(path=args.corpus, status=status_printer(args.quiet))
+    if mismatches:
+        raise Exception(f"ключи не совпали с корпусом: {len(mismatches)}")
+    print(f"✅ Все ключи совпадают (бэкенд {cadc_keys.key_engine.backend})")
+
+def cmd_verify_codec(args):
+    status = status_printer(args.quiet)
+    failures = cadc_codec.verify_codec(samples=args.samples, seed=args.seed, status=status)
+    # Имена новых архивов должны декодироваться в свой OK
+    for _ in range(args.samples):
+        ok_str = cadc_core.generate_ok()
+        decoded = cadc_core.archive_name_to_ok(cadc_core.ok_to_archive_name(ok_str))
+        if decoded != ok_str:
+            failures.append(('archive_name', ok_str, decoded))
+    for failure in failures[:20]:
+        print(f"{failure[0]}: {failure[1]!r} -> {failure[2]!r}", file=sys.stderr)
+    if failures:
+        raise Exception(f"ошибок кодека: {len(failures)}")
+    print("✅ Кодек прошел самопроверку")
+
+def compression_spec(value):
+    # Проверяем спецификацию сразу при разборе аргументов
+    try:
+        cadc_zip.CompressionPolicy.parse(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+# В терминале прогресс обновляем реже, чем в GUI
+CLI_PROGRESS_RATE = 2
+
+COMPRESSION_HELP = ("сжатие: stored, deflate[:0-9], bzip2[:1-9], lzma или auto[:0-9] "
+                    "(deflate, уже сжатые файлы без сжатия); по умолчанию deflate")
+
+MMAP_HELP = "читать большие файлы через mmap (без копий в буферы Python)"
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cadc", description="CADC: генерация ключей и шифрованные архивы .cp")
+    parser.add_argument("--backend", choices=cadc_keys.BACKENDS, default="auto",
+                        help="бэкенд генерации ключа (gmpy2/mpmath — опционально)")
+    parser.add_argument("--metrics", help="сохранить время стадий и счетчики задачи в JSON")
+    parser.add_argument("--profile", help="сохранить статистику cProfile (pstats) в файл")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="отследить пик памяти и места выделения (в метриках)")
+    parser.add_argument("--key-cache-size", type=int,
+                        help="сколько ключей держать в кеше (0 — без кеша; по умолчанию CADC_KEY_CACHE_SIZE или 256)")
+    parser.add_argument("--key-cache-ttl", type=float,
+                        help="время жизни ключа в кеше, секунд (по умолчанию CADC_KEY_CACHE_TTL или без ограничения)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    derive = subparsers.add_parser("derive", help="сгенерировать ключ по файлу параметров")
+    derive.add_argument("params", help="файл параметров (путь или имя в list_CADC)")
+    derive.add_argument("--ok", help="публичный ключ OK (по умолчанию случайный)")
+    derive.add_argument("--archive", action="store_true", help="ключ в режиме архива (как при pack/unpack)")
+    derive.set_defaults(func=cmd_derive)
+
+    derive_batch = subparsers.add_parser("derive-batch", help="ключи архивов для набора OK (таблица ключей)")
+    derive_batch.add_argument("params", help="файл параметров (путь или имя в list_CADC)")
+    derive_batch.add_argument("--ok", action="append", help="OK архива (можно повторять)")
+    derive_batch.add_argument("--count", type=int, default=0, help="дополнить случайными OK до N штук")
+    derive_batch.add_argument("--save", action="store_true",
+                              help="сохранить ключи в таблицу list_CADC/.cadc-keys для распаковки")
+    derive_batch.add_argument("--json", action="store_true", help="вывести результат в JSON")
+    derive_batch.add_argument("-q", "--quiet", action="store_true", help="не выводить статус")
+    derive_batch.set_defaults(func=cmd_derive_batch)
+
+    pack = subparsers.add_parser("pack", help="заархивировать папку или файл")
+    pack.add_argument("path", help="папка или файл для архивации")
+    pack.add_argument("params", help="файл параметров (путь или имя в list_CADC)")
+    pack.add_argument("-j", "--workers", type=int, default=1,
+                      help="потоков для параллельного сжатия элементов (по умолчанию 1)")
+    pack.add_argument("-c", "--compression", type=compression_spec, help=COMPRESSION_HELP)
+    pack.add_argument("--dedup", action="store_true",
+                      help="хранить одинаковые файлы один раз, дубликаты — ссылками")
+    pack.add_argument("--mmap", action="store_true", help=MMAP_HELP)
+    pack.add_argument("--progress-rate", type=float, default=CLI_PROGRESS_RATE,
+                      help="не больше стольких строк прогресса в секунду")
+    pack.add_argument("-q", "--quiet", action="store_true", help="не выводить статус")
+    pack.set_defaults(func=cmd_pack)
+
+    batch = subparsers.add_parser("pack-batch", help="заархивировать много папок/файлов параллельно")
+    batch.add_argument("params", help="файл параметров (путь или имя в list_CADC)")
+    batch.add_argument("paths", nargs="*", help="папки или файлы для архивации")
+    batch.add_argument("--children", action="append", metavar="ПАПКА",
+                       help="добавить все папки и файлы внутри ПАПКИ (можно повторять)")
+    batch.add_argument("-j", "--workers", type=int, help="число процессов (по умолчанию — число ядер)")
+    batch.add_argument("-c", "--compression", type=compression_spec, help=COMPRESSION_HELP)
+    batch.add_argument("--json", action="store_true", help="вывести результаты и сводку в JSON")
+    batch.add_argument("-q", "--quiet", action="store_true", help="не выводить статус")
+    batch.set_defaults(func=cmd_pack_batch)
+
+    unpack = subparsers.add_parser("unpack", help="расшифровать и распаковать архив .cp")
+    unpack.add_argument("archive", help="архив .cp")
+    unpack.add_argument("params", help="файл параметров (путь или имя в list_CADC)")
+    unpack.add_argument("--buffer-size", type=int, default=cadc_zip.EXTRACT_BUFFER_SIZE,
+                        help="размер буфера потоковой распаковки в байтах")
+    unpack.add_argument("--progress-rate", type=float, default=CLI_PROGRESS_RATE,
+                        help="не больше стольких строк прогресса в секунду")
+    unpack.add_argument("-q", "--quiet", action="store_true", help="не выводить статус")
+    unpack.set_defaults(func=cmd_unpack)
+
+    listing = subparsers.add_parser("list", help="показать содержимое архива (без расшифровки)")
+    listing.add_argument("archive", help="архив .cp")
+    listing.add_argument("params", nargs="?",
+                         help="файл параметров: нужен только чтобы показать дубликаты (--dedup)")
+    listing.add_argument("--json", action="store_true", help="вывести список в JSON")
+    listing.set_defaults(func=cmd_list)
+
+    extract = subparsers.add_parser("extract", help="распаковать только выбранные файлы")
+    extract.add_argument("archive", help="архив .cp")
+    extract.add_argument("params", help="файл параметров (путь или имя в list_CADC)")
+    extract.add_argument("patterns", nargs="+",
+                         help="glob-шаблоны (*, ?, [..]) или пути файлов/папок внутри архива")
+    extract.add_argument("-o", "--output", help="папка для распаковки (по умолчанию CADC_<имя архива>)")
+    extract.add_argument("--buffer-size", type=int, default=cadc_zip.EXTRACT_BUFFER_SIZE,
+                         help="размер буфера потоковой распаковки в байтах")
+    extract.add_argument("--progress-rate", type=float, default=CLI_PROGRESS_RATE,
+                         help="не больше стольких строк прогресса в секунду")
+    extract.add_argument("-q", "--quiet", action="store_true", help="не выводить статус")
+    extract.set_defaults(func=cmd_extract)
+
+    update = subparsers.add_parser("update", help="обновить архив: дописать только измененные файлы")
+    update.add_argument("path", help="папка или файл, из которых был создан архив")
+    update.add_argument("archive", help="архив .cp")
+    update.add_argument("params", help="файл параметров (путь или имя в list_CADC)")
+    update.add_argument("-j", "--workers", type=int, default=1,
+                        help="потоков для параллельного сжатия элементов (по умолчанию 1)")
+    update.add_argument("-c", "--compression", type=compression_spec, help=COMPRESSION_HELP)
+    update.add_argument("--mmap", action="store_true", help=MMAP_HELP)
+    update.add_argument("--compact-ratio", type=float, default=cadc_core.COMPACT_RATIO,
+                        help="уплотнять архив, когда мертвые байты превышают эту долю")
+    update.add_argument("--progress-rate", type=float, default=CLI_PROGRESS_RATE,
+                        help="не больше стольких строк прогресса в секунду")
+    update.add_argument("-q", "--quiet", action="store_true", help="не выводить статус")
+    update.set_defaults(func=cmd_update)
+
+    copy = subparsers.add_parser("copy", help="скопировать элементы архивов в другой архив без распаковки")
+    copy.add_argument("params", help="файл параметров архивов-источников (путь или имя в list_CADC)")
+    copy.add_argument("archives", nargs="+", help="архивы .cp, из которых копировать")
+    copy.add_argument("-o", "--output",
+                      help="существующий архив .cp (дописать в него) или папка для нового архива "
+                           "(по умолчанию папка первого архива)")
+    copy.add_argument("-p", "--pattern", dest="patterns", action="append",
+                      help="копировать только подходящие элементы (glob или путь; можно несколько раз)")
+    copy.add_argument("--target-params", help="файл параметров ключа целевого архива (по умолчанию тот же)")
+    copy.add_argument("--keep-key", action="store_true",
+                      help="новый архив с OK и именем первого архива: элементы копируются как есть")
+    copy.add_argument("--progress-rate", type=float, default=CLI_PROGRESS_RATE,
+                      help="не больше стольких строк прогресса в секунду")
+    copy.add_argument("-q", "--quiet", action="store_true", help="не выводить статус")
+    copy.set_defaults(func=cmd_copy)
+
+    params = subparsers.add_parser("params", help="список файлов параметров list_CADC")
+    params.add_argument("--json", action="store_true", help="вывести разобранные параметры в JSON")
+    params.add_argument("--save-index", action="store_true",
+                        help="сохранить разобранный индекс для быстрого старта")
+    params.set_defaults(func=cmd_params)
+
+    verify = subparsers.add_parser("verify-keys", help="сверить ключи с корпусом совместимости")
+    verify.add_argument("--corpus", help="файл корпуса (по умолчанию cadc_key_corpus.json)")
+    verify.add_argument("-q", "--quiet", action="store_true", help="не выводить статус")
+    verify.set_defaults(func=cmd_verify_keys)
+
+    verify_codec = subparsers.add_parser("verify-codec", help="самопроверка кодека имен архивов")
+    verify_codec.add_argument("--samples", type=int, default=20000, help="случайных проверок каждого вида")
+    verify_codec.add_argument("--seed", type=int, default=0)
+    verify_codec.add_argument("-q", "--quiet", action="store_true", help="не выводить статус")
+    verify_codec.set_defaults(func=cmd_verify_codec)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # Метрики собираем, только если их попросили
+    args.job_metrics = cadc_metrics.Metrics() if args.metrics or args.tracemalloc else None
+    try:
+        cadc_keys.set_backend(args.backend)
+        if args.key_cache_size is not None or args.key_cache_ttl is not None:
+            cache = cadc_keys.key_cache
+            cache.configure(cache.maxsize if args.key_cache_size is None else args.key_cache_size,
+                            cache.ttl if args.key_cache_ttl is None else args.key_cache_ttl)
+        try:
+            with cadc_metrics.profiled(args.profile, args.tracemalloc, args.job_metrics):
+                return args.func(args) or 0
+        finally:
+            if args.metrics:
+                args.job_metrics.save(args.metrics)
+            elif args.job_metrics is not None:
+                print(json.dumps(args.job_metrics.report(), ensure_ascii=False, indent=1), file=sys.stderr)
+    except FileNotFoundError:
+        print("🤬 Ошибка! Файл не найден!", file=sys.stderr)
+        return 1
+    except Exception as e:
+        print(f"🤬 Ошибка! {str(e)}", file=sys.stderr)
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
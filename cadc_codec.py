@@ -0,0 +1,179 @@
+import itertools
+import random
+import re
+
+# Кодек цифр CADC: пары цифр <-> символы (имена архивов .cp, ключи в GUI).
+#
+# Таблицы строятся один раз при импорте. Кодирование — один проход по
+# парам с заменой по таблице, декодирование — одно регулярное выражение
+# со всеми кодами (двухсимвольные раньше односимвольных), так что поиск
+# идет в C. Поведение совпадает с исходным BaseEncodingClass: нечетная
+# строка дополняется ведущим нулем, неизвестная пара кодируется как '??',
+# при декодировании неизвестные символы пропускаются, а ведущий ноль
+# убирается.
+#
+# Коды не префиксные: "AA" — это и пара 26, и две пары 00. Алфавит зашит в
+# имена уже созданных архивов, поэтому он не меняется; вместо этого
+# декодирование детерминированное (всегда самый длинный код), а новые OK
+# выбираются только такими, чье имя этот декодер возвращает обратно в те же
+# цифры (round_trips) — такое имя декодируется с первого раза одним проходом.
+
+ENCODING_MAP = {
+    "00": "A", "01": "B", "02": "C", "03": "D", "04": "E",
+    "05": "F", "06": "G", "07": "H", "08": "I", "09": "J",
+    "10": "K", "11": "L", "12": "M", "13": "N", "14": "O",
+    "15": "P", "16": "Q", "17": "R", "18": "S", "19": "T",
+    "20": "U", "21": "V", "22": "W", "23": "X", "24": "Y",
+    "25": "Z", "26": "AA", "27": "BB", "28": "CC", "29": "DD",
+    "30": "EE", "31": "FF", "32": "GG", "33": "HH", "34": "II",
+    "35": "JJ", "36": "KK", "37": "LL", "38": "MM", "39": "NN",
+    "40": "OO", "41": "PP", "42": "QQ", "43": "RR", "44": "SS",
+    "45": "TT", "46": "UU", "47": "VV", "48": "WW", "49": "XX",
+    "50": "YY", "51": "ZZ", "52": "ab", "53": "bc", "54": "cd",
+    "55": "de", "56": "ef", "57": "fg", "58": "gh", "59": "hi",
+    "60": "ij", "61": "jk", "62": "kl", "63": "lm", "64": "mn",
+    "65": "no", "66": "op", "67": "pq", "68": "qr", "69": "rs",
+    "70": "st", "71": "tu", "72": "uv", "73": "vw", "74": "wx",
+    "75": "xy", "76": "yz", "77": "12", "78": "23", "79": "34",
+    "80": "45", "81": "56", "82": "67", "83": "78", "84": "89",
+    "85": "90", "86": "@#", "87": "#$", "88": "$%", "89": "%^",
+    "90": "^^", "91": "**", "92": "((", "93": "))", "94": "++",
+    "95": "==", "96": "~~", "97": "!!", "98": "@@", "99": "##",
+    ".": "{", ",": "}"
+}
+
+UNKNOWN_PAIR = '??'
+# Разделитель строк в пакетном декодировании: его нет среди кодов
+BATCH_SEPARATOR = '\n'
+
+class _EncodeTable(dict):
+    def __missing__(self, pair):
+        return UNKNOWN_PAIR
+
+ENCODE_TABLE = _EncodeTable(ENCODING_MAP)
+DECODE_TABLE = {code: digits for digits, code in ENCODING_MAP.items()}
+# Коды по значению пары: CODE_BY_PAIR[37] == "LL"
+CODE_BY_PAIR = tuple(ENCODING_MAP[f"{pair:02d}"] for pair in range(100))
+
+_CODE_RE = re.compile('|'.join(re.escape(code) for code in
+                               sorted(DECODE_TABLE, key=len, reverse=True)))
+_BATCH_CODE_RE = re.compile(_CODE_RE.pattern + '|' + re.escape(BATCH_SEPARATOR))
+_BATCH_DECODE_TABLE = dict(DECODE_TABLE, **{BATCH_SEPARATOR: BATCH_SEPARATOR})
+
+def encode_numbers(number_string):
+    if len(number_string) % 2 != 0:
+        number_string = '0' + number_string
+    # Пары собираются срезами с шагом 2 — без цикла по индексам в Python
+    pairs = map(''.join, zip(number_string[::2], number_string[1::2]))
+    return ''.join(map(ENCODE_TABLE.__getitem__, pairs))
+
+def _strip_padding(decoded):
+    # Убираем ведущий ноль, если он был добавлен
+    if decoded.startswith('0') and len(decoded) > 1:
+        return decoded[1:]
+    return decoded
+
+def decode_numbers(encoded_string):
+    return _strip_padding(''.join(map(DECODE_TABLE.__getitem__, _CODE_RE.findall(encoded_string))))
+
+def encode_many(number_strings):
+    return [encode_numbers(number_string) for number_string in number_strings]
+
+def decode_many(encoded_strings):
+    # Весь пакет декодируется одним проходом регулярного выражения. Если
+    # разделитель встречается внутри имен, склейка дала бы лишние элементы —
+    # тогда декодируем по одному (decode_numbers такие символы пропускает)
+    encoded_strings = list(encoded_strings)
+    if not encoded_strings:
+        return []
+    joined = BATCH_SEPARATOR.join(encoded_strings)
+    if joined.count(BATCH_SEPARATOR) != len(encoded_strings) - 1:
+        return [decode_numbers(encoded_string) for encoded_string in encoded_strings]
+    decoded = ''.join(map(_BATCH_DECODE_TABLE.__getitem__, _BATCH_CODE_RE.findall(joined)))
+    return [_strip_padding(item) for item in decoded.split(BATCH_SEPARATOR)]
+
+def encode_pairs(rows):
+    # rows — последовательность строк из значений пар 0..99 (списки или
+    # двумерный массив NumPy целых): каждая строка кодируется целиком,
+    # без разбора текста на пары
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    if numpy is not None and isinstance(rows, numpy.ndarray):
+        if rows.ndim != 2:
+            raise ValueError("Ожидается двумерный массив пар цифр")
+        if rows.size and (rows.min() < 0 or rows.max() > 99):
+            raise ValueError("Значения пар должны быть от 0 до 99")
+        codes = numpy.array(CODE_BY_PAIR, dtype=object)[rows]
+        return [''.join(row) for row in codes]
+    return [''.join(CODE_BY_PAIR[pair] for pair in row) for row in rows]
+
+def parse_count(encoded_string, limit=2):
+    # Число разборов строки на коды (не больше limit) — независимая от
+    # жадного декодера проверка однозначности
+    counts = [1] + [0] * len(encoded_string)
+    for end in range(1, len(encoded_string) + 1):
+        total = 0
+        if encoded_string[end - 1] in DECODE_TABLE:
+            total += counts[end - 1]
+        if end >= 2 and encoded_string[end - 2:end] in DECODE_TABLE:
+            total += counts[end - 2]
+        counts[end] = min(total, limit)
+    return counts[-1]
+
+def round_trips(number_string):
+    # Имя из этих цифр декодируется обратно в них же
+    return decode_numbers(encode_numbers(number_string)) == number_string
+
+def verify_codec(samples=20000, seed=0, max_exhaustive=4, status=None):
+    # Самопроверка кодека: все строки до max_exhaustive цифр и samples
+    # случайных строк разной длины. Возвращает список (проверка, вход, результат)
+    failures = []
+    rng = random.Random(seed)
+
+    def check(number_string):
+        encoded = encode_numbers(number_string)
+        decoded = decode_numbers(encoded)
+        # Декодер выбирает один из разборов имени: обратное кодирование
+        # дает то же имя
+        if encode_numbers(decoded) != encoded:
+            failures.append(('canonical', number_string, decoded))
+        # Ведущий ноль формат не хранит (он же признак дополнения)
+        if number_string.startswith('0'):
+            return
+        if parse_count(encoded) == 1 and decoded != number_string:
+            failures.append(('roundtrip', number_string, decoded))
+
+    checked = 0
+    for length in range(1, max_exhaustive + 1):
+        for digits in itertools.product('0123456789', repeat=length):
+            check(''.join(digits))
+            checked += 1
+    if status:
+        status(f"Полный перебор до {max_exhaustive} цифр: {checked}")
+
+    numbers = [''.join(rng.choice('0123456789') for _ in range(rng.randint(1, 64)))
+               for _ in range(samples)]
+    for number_string in numbers:
+        check(number_string)
+    encoded = encode_many(numbers)
+    # Пакет с разделителем внутри имени: ответ все равно по одному на вход
+    batches = [encoded]
+    if len(encoded) >= 2:
+        batches.append(encoded[:3] + [encoded[0] + BATCH_SEPARATOR + encoded[1]])
+    for batch in batches:
+        decoded = decode_many(batch)
+        if len(decoded) != len(batch):
+            failures.append(('decode_many', len(batch), len(decoded)))
+        for name, result in zip(batch, decoded):
+            if result != decode_numbers(name):
+                failures.append(('decode_many', name, result))
+    rows = [[rng.randrange(100) for _ in range(rng.randint(0, 20))] for _ in range(min(samples, 10000))]
+    for row, name in zip(rows, encode_pairs(rows)):
+        expected = encode_numbers(''.join(f"{pair:02d}" for pair in row))
+        if name != expected:
+            failures.append(('encode_pairs', row, name))
+    if status:
+        status(f"Случайных строк: {samples}, ошибок: {len(failures)}")
+    return failures
@@ -0,0 +1,1130 @@
+import os
+import random
+import hashlib
+import json
+import shutil
+import threading
+import time
+import zlib
+from collections import deque
+from contextlib import ExitStack
+from pathlib import Path
+import pyzipper
+import cadc_codec
+import cadc_keys
+import cadc_metrics
+import cadc_params
+import cadc_zip
+
+# Ядро CADC без зависимостей от Qt: генерация ключа и работа с архивами .cp.
+# Используется и GUI (CADC.py), и консольной утилитой (cadc_cli.py).
+
+def get_application_path():
+    return Path(os.environ.get("RUN_CADC_PATH", ""))
+
+directory_path = get_application_path()
+folder_path = directory_path / "list_CADC"
+
+def check_folder_file():
+
+    if not folder_path.is_dir():
+        try:
+            folder_path.mkdir(parents=True, exist_ok=True)
+        except Exception as e:
+            pass
+    return folder_path
+
+class BaseEncodingClass:
+    # Таблицы и быстрые кодирование/декодирование — в cadc_codec
+    def generate_encoding_map(self):
+        return dict(cadc_codec.ENCODING_MAP)
+
+    def encode_numbers(self, number_string):
+        return cadc_codec.encode_numbers(number_string)
+
+    def decode_numbers(self, encoded_string):
+        return cadc_codec.decode_numbers(encoded_string)
+
+class NumberCodec(BaseEncodingClass):
+    def __init__(self):
+        self.encoding_map = self.generate_encoding_map()
+
+codec = NumberCodec()
+
+# Общий реестр разобранных файлов параметров (см. cadc_params)
+params_registry = cadc_params.ParamRegistry(folder_path)
+
+def resolve_params_file(name):
+    # Принимаем как путь к файлу, так и имя файла из list_CADC
+    # (расширение .txt/.json можно не указывать)
+    path = Path(name)
+    if path.is_file():
+        return path
+    candidate = folder_path / name
+    if not candidate.is_file() and not name.endswith(cadc_params.PARAM_EXTENSIONS):
+        for extension in cadc_params.PARAM_EXTENSIONS:
+            if (folder_path / f"{name}{extension}").is_file():
+                return folder_path / f"{name}{extension}"
+        candidate = folder_path / f"{name}.txt"
+    return candidate
+
+def read_params(params_file):
+    return params_registry.get(params_file)
+
+def generate_ok():
+    # Формат OK фиксируется сразу при создании (5 знаков после точки).
+    # OK, чье имя архива декодируется в другие цифры, пропускаем: такой
+    # архив потом не расшифровать по имени
+    while True:
+        ok_str = f"{round(random.uniform(15.01, 999.99999), 5):.5f}"
+        if cadc_codec.round_trips(ok_str.replace(".", "")):
+            return ok_str
+
+def generate_public_ok():
+    # OK окна генерации ключа (без фиксации количества знаков)
+    return str(round(random.uniform(15.01, 999.99999), 5))
+
+def derive_key(PK, exponent, prec, key_len):
+    return cadc_keys.key_engine.derive(PK, exponent, prec, key_len)
+
+def derive_archive_key(params, ok_str):
+    # Ключ архива: PK ** (OK + PK2), как в ArchiveThread.
+    # Сначала кеш процесса, затем таблица ключей (если она сохранена)
+    def derive():
+        table = load_key_table(params)
+        key = table.get(ok_str) if table else None
+        if key is not None:
+            return key
+        exponent = cadc_keys.archive_exponent(ok_str, params['PK2'], params['prec'])
+        return derive_key(params['PK'], exponent, params['prec'], params['key_len'])
+    cache_key = (cadc_keys.params_fingerprint(params), 'archive', ok_str)
+    return cadc_keys.key_cache.get_or_derive(cache_key, derive)
+
+def derive_archive_keys(params, oks, save=False, status=None):
+    # Ключи архивов для набора OK одним проходом (см. KeyEngine.derive_many).
+    # Возвращает {OK: ключ}; save — дописать их в таблицу ключей параметров
+    fingerprint = cadc_keys.params_fingerprint(params)
+    oks = list(dict.fromkeys(oks))
+    keys = {}
+    pending = []
+    for ok_str in oks:
+        key = cadc_keys.key_cache.get((fingerprint, 'archive', ok_str))
+        if key is None:
+            pending.append(ok_str)
+        else:
+            keys[ok_str] = key
+    _emit(status, f"⌛ Генерация ключей: {len(pending)} из {len(oks)}...")
+    exponents = [cadc_keys.archive_exponent(ok_str, params['PK2'], params['prec']) for ok_str in pending]
+    derived = cadc_keys.key_engine.derive_many(params['PK'], exponents, params['prec'], params['key_len'])
+    for ok_str, key in zip(pending, derived):
+        cadc_keys.key_cache.put((fingerprint, 'archive', ok_str), key)
+        keys[ok_str] = key
+    if save:
+        table = load_key_table(params) or cadc_keys.KeyTable(fingerprint)
+        table.update(keys)
+        path = key_table_path(params)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table.save(path)
+        with _key_tables_lock:
+            _key_tables.pop(fingerprint, None)
+        _emit(status, f"✅ Таблица ключей: {len(table.keys)} ({path.name})")
+    return {ok_str: keys[ok_str] for ok_str in oks}
+
+# Таблицы ключей лежат в list_CADC/.cadc-keys/<хеш параметров>.json
+KEY_TABLE_DIR = ".cadc-keys"
+# хеш параметров -> ((mtime_ns, размер) файла таблицы, таблица)
+_key_tables = {}
+_key_tables_lock = threading.Lock()
+
+def key_table_path(params):
+    return folder_path / KEY_TABLE_DIR / f"{cadc_keys.params_fingerprint(params)}.json"
+
+def load_key_table(params):
+    # Таблица ключей параметров или None; перечитывается, если файл изменился
+    fingerprint = cadc_keys.params_fingerprint(params)
+    path = key_table_path(params)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _key_tables_lock:
+        entry = _key_tables.get(fingerprint)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+    table = cadc_keys.KeyTable.load(path, fingerprint)
+    if table is not None:
+        with _key_tables_lock:
+            _key_tables[fingerprint] = (signature, table)
+    return table
+
+def derive_public_key(params, OK):
+    # Ключ окна генерации: показатель считается во float, как в CodingThread
+    def derive():
+        exponent = cadc_keys.public_exponent(OK, params['PK2'])
+        return derive_key(params['PK'], exponent, params['prec'], params['key_len'])
+    cache_key = (cadc_keys.params_fingerprint(params), 'public', str(OK))
+    return cadc_keys.key_cache.get_or_derive(cache_key, derive)
+
+def ok_to_archive_name(ok_str):
+    return codec.encode_numbers(ok_str.replace(".", ""))
+
+def archive_name_to_ok(encoded_ok):
+    decoded_numbers = codec.decode_numbers(encoded_ok)
+    if not decoded_numbers:
+        raise Exception("Не удалось расшифровать OK из имени файла")
+
+    # Преобразуем расшифрованное число обратно с фиксированной точностью
+    try:
+        decoded_str = str(decoded_numbers)
+        if len(decoded_str) < 6:
+            raise ValueError("Некорректная длина расшифрованного значения")
+
+        ok_str = f"{decoded_str[:-5]}.{decoded_str[-5:]}"
+        float(ok_str)
+    except ValueError as e:
+        raise Exception(f"Некорректный формат зашифрованного OK: {str(e)}")
+    return ok_str
+
+def _emit(status, message):
+    if status:
+        status(message)
+
+# Не больше стольких обновлений прогресса в секунду
+PROGRESS_RATE = 10
+
+class Progress:
+    # Прогресс операции с ограничением частоты обновлений. Колбэк получает
+    # словарь: action, files, total_files, bytes, total_bytes, elapsed, eta,
+    # done. Без колбэка прогресса, но со status — в status уходит текст
+
+    def __init__(self, action, callback=None, status=None, total_files=None, total_bytes=None,
+                 rate=PROGRESS_RATE):
+        self.action = action
+        self.callback = callback
+        self.status = status
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.interval = 1.0 / rate if rate else 0.0
+        self.files = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self._last = None
+
+    def advance(self, files=0, nbytes=0):
+        self.files += files
+        self.bytes += nbytes
+        now = time.monotonic()
+        if self._last is None or now - self._last >= self.interval:
+            self._last = now
+            self._send(self.snapshot(now))
+
+    def finish(self):
+        self._send(self.snapshot(time.monotonic(), done=True))
+
+    def snapshot(self, now=None, done=False):
+        elapsed = (now or time.monotonic()) - self.started
+        eta = None
+        if done:
+            eta = 0.0
+        elif self.total_bytes and self.bytes:
+            eta = elapsed * (self.total_bytes - self.bytes) / self.bytes
+        elif self.total_files and self.files:
+            eta = elapsed * (self.total_files - self.files) / self.files
+        return {
+            'action': self.action,
+            'files': self.files,
+            'total_files': self.total_files,
+            'bytes': self.bytes,
+            'total_bytes': self.total_bytes,
+            'elapsed': elapsed,
+            'eta': eta,
+            'done': done,
+        }
+
+    def _send(self, snapshot):
+        if self.callback:
+            self.callback(snapshot)
+        elif self.status:
+            self.status(format_progress(snapshot))
+
+def format_progress(progress):
+    MB = 1024 * 1024
+    text = f"⌛ {progress['action']}: {progress['files']}"
+    if progress['total_files'] is not None:
+        text += f"/{progress['total_files']}"
+    text += f" файлов, {progress['bytes'] / MB:.1f}"
+    if progress['total_bytes'] is not None:
+        text += f"/{progress['total_bytes'] / MB:.1f}"
+    text += " МБ"
+    if progress['eta'] is not None and not progress['done']:
+        text += f", осталось ~{progress['eta']:.0f} с"
+    return text
+
+def scan_tree(source_dir):
+    # Один проход os.scandir в порядке os.walk: (путь, имя в архиве, размер);
+    # путь None — пустая папка. Размер берется из того же DirEntry,
+    # None — если stat не удался (ошибку покажет запись файла)
+    source_dir = Path(source_dir)
+    stack = [str(source_dir)]
+    while stack:
+        root = stack.pop()
+        # Создаем относительный путь, сохраняя структуру папок
+        rel_path = os.path.relpath(root, source_dir.parent)
+        files = []
+        dirs = []
+        try:
+            with os.scandir(root) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if not is_dir:
+                        files.append(entry)
+                    else:
+                        dirs.append(entry)
+        except OSError:
+            # Как os.walk: недоступные папки пропускаем
+            continue
+
+        # Добавляем пустые директории
+        if not files and not dirs:
+            yield None, os.path.join(rel_path, ""), None
+
+        for entry in files:
+            try:
+                size = entry.stat().st_size
+            except OSError:
+                size = None
+            yield Path(entry.path), os.path.join(rel_path, entry.name), size
+
+        # Ссылки на папки, как и os.walk, не обходим
+        stack.extend(entry.path for entry in reversed(dirs) if not entry.is_symlink())
+
+# Файлы меньше этого размера не дедуплицируем: запись в индексе
+# почти не дешевле самого элемента
+DEDUP_MIN_SIZE = 4 * 1024
+
+class Deduplicator:
+    # Дедупликация по содержимому (sha256). Хешируются только файлы, для
+    # которых уже встречался файл того же размера; первый файл такого
+    # размера хешируется лениво, при появлении второго. Дубликаты не
+    # попадают в архив, а записываются в index: имя -> имя оригинала
+
+    def __init__(self, min_size=DEDUP_MIN_SIZE):
+        self.min_size = min_size
+        self.index = {}
+        self.saved_bytes = 0
+        self._by_size = {}
+
+    def filter(self, entries):
+        for file_path, arcname, size in entries:
+            if file_path is None or size is None or size < self.min_size:
+                yield file_path, arcname, size
+                continue
+            original = self._find_original(file_path, arcname, size)
+            if original is None:
+                yield file_path, arcname, size
+            else:
+                self.index[arcname] = original
+                self.saved_bytes += size
+
+    def _find_original(self, file_path, arcname, size):
+        candidates = self._by_size.setdefault(size, [])
+        digest = None
+        if candidates:
+            try:
+                digest = file_digest(file_path)
+                for candidate in candidates:
+                    if candidate[2] is None:
+                        candidate[2] = file_digest(candidate[0])
+                    if candidate[2] == digest:
+                        return candidate[1]
+            except OSError:
+                # Ошибку чтения покажет запись файла
+                return None
+        candidates.append([file_path, arcname, digest])
+        return None
+
+    def drop_failed(self, failed):
+        # Оригиналы, которые не удалось записать, не могут служить ссылкой
+        lost = [name for name, original in self.index.items() if original in failed]
+        for name in lost:
+            del self.index[name]
+        return lost
+
+class TreeScan:
+    # Обход папки в фоновом потоке: архивация забирает элементы сразу,
+    # а общее число и объем файлов становятся известны, когда обход
+    # закончится (done). Отдельного предварительного обхода нет.
+    # Обход опережает писателя не больше чем на SCAN_QUEUE_LIMIT элементов:
+    # огромное дерево не копится в памяти целиком
+
+    SCAN_QUEUE_LIMIT = 10000
+
+    def __init__(self, source_dir, dedup=None):
+        self.dedup = dedup
+        self.files = 0
+        self.bytes = 0
+        self.done = False
+        # Длительность обхода, когда он закончится
+        self.elapsed = None
+        self._entries = deque()
+        self._error = None
+        self._stopped = False
+        self._ready = threading.Condition()
+        self._thread = threading.Thread(target=self._scan, args=(source_dir,), daemon=True)
+        self._thread.start()
+
+    def _scan(self, source_dir):
+        started = time.perf_counter()
+        try:
+            entries = scan_tree(source_dir)
+            if self.dedup:
+                # Хеширование идет здесь, в потоке обхода, а не в писателе
+                entries = self.dedup.filter(entries)
+            for file_path, arcname, size in entries:
+                with self._ready:
+                    while len(self._entries) >= self.SCAN_QUEUE_LIMIT and not self._stopped:
+                        self._ready.wait()
+                    if self._stopped:
+                        return
+                    if file_path is not None:
+                        self.files += 1
+                        self.bytes += size or 0
+                    self._entries.append((file_path, arcname, size))
+                    self._ready.notify_all()
+        except Exception as e:
+            self._error = e
+        finally:
+            with self._ready:
+                self.elapsed = time.perf_counter() - started
+                self.done = True
+                self._ready.notify_all()
+
+    def __iter__(self):
+        try:
+            while True:
+                with self._ready:
+                    while not self._entries and not self.done:
+                        self._ready.wait()
+                    if self._entries:
+                        entry = self._entries.popleft()
+                        self._ready.notify_all()
+                    elif self._error:
+                        raise self._error
+                    else:
+                        return
+                yield entry
+        finally:
+            self.stop()
+
+    def stop(self):
+        # Вызывается и при ошибке записи: поток обхода не должен ждать
+        # места в очереди или обходить дерево дальше
+        with self._ready:
+            self._stopped = True
+            self._entries.clear()
+            self._ready.notify_all()
+
+def pack(selected_path, params_file, status=None, overwrite=True, workers=1, compression=None,
+         progress=None, progress_rate=PROGRESS_RATE, dedup=False, metrics=None, mmap_input=False):
+    # workers > 1 — элементы сжимаются и шифруются параллельно в потоках;
+    # compression — метод/уровень сжатия (см. cadc_zip.CompressionPolicy);
+    # progress — колбэк прогресса (см. Progress);
+    # dedup — одинаковые файлы хранятся один раз (см. Deduplicator);
+    # metrics — замеры стадий (см. cadc_metrics.Metrics);
+    # mmap_input — читать большие файлы через mmap (см. cadc_zip.input_chunks)
+    archive_path = None
+    try:
+        if not selected_path or not os.path.exists(selected_path):
+            raise Exception("Выбранный путь не существует")
+
+        # Используем ту же директорию, что и исходный файл/папка
+        source_dir = Path(selected_path)
+        target_dir = source_dir.parent
+        policy = cadc_zip.CompressionPolicy.parse(compression)
+
+        _emit(status, "⌛ Генерация ключа...")
+        with cadc_metrics.stage(metrics, 'params'):
+            params = read_params(params_file)
+
+        ok_str = generate_ok()
+        if not overwrite:
+            # Подбираем OK, под которым в папке еще нет архива
+            while (target_dir / f"{ok_to_archive_name(ok_str)}.cp").exists():
+                ok_str = generate_ok()
+        _emit(status, f"Сгенерированный OK: {ok_str}")
+        with cadc_metrics.stage(metrics, 'key'):
+            public_key = derive_archive_key(params, ok_str)
+
+        _emit(status, "⌛ Подготовка архива...")
+        encoded_ok = ok_to_archive_name(ok_str)
+        target_path = target_dir / f"{encoded_ok}.cp"
+
+        if overwrite and os.path.exists(target_path):
+            os.remove(target_path)
+
+        _emit(status, "⌛ Создание архива...")
+
+        # Создаем защищенный архив; без overwrite файл создается эксклюзивно,
+        # чтобы параллельные задачи не затерли архивы друг друга
+        with pyzipper.AESZipFile(target_path, 'w' if overwrite else 'x', compression=pyzipper.ZIP_DEFLATED, encryption=pyzipper.WZ_AES) as zipf:
+            archive_path = target_path
+            zipf.setpassword(str(public_key).encode())
+            zipf.setencryption(pyzipper.WZ_AES, nbits=256)
+
+            if os.path.isfile(selected_path):
+                _emit(status, f"⌛ Добавление файла {os.path.basename(selected_path)}...")
+                arcname = os.path.basename(selected_path)
+                compress_type, compresslevel = policy.choose(selected_path)
+                tracker = Progress("Архивация", progress, status, 1, os.path.getsize(selected_path),
+                                   progress_rate)
+                with cadc_metrics.stage(metrics, 'compress_encrypt', arcname):
+                    cadc_zip.write_file(zipf, selected_path, arcname, compress_type, compresslevel, mmap_input,
+                                        on_chunk=lambda nbytes: tracker.advance(nbytes=nbytes))
+                tracker.advance(files=1)
+                tracker.finish()
+                cadc_metrics.count(metrics, 'files')
+                cadc_metrics.count(metrics, 'bytes', zipf.filelist[-1].file_size)
+            else:
+                # Обход и архивация идут одновременно; итоги для прогресса
+                # появляются, когда обход закончится
+                deduplicator = Deduplicator() if dedup else None
+                scan = TreeScan(source_dir, deduplicator)
+                tracker = Progress("Архивация", progress, status, rate=progress_rate)
+                failed = set()
+
+                # Байты считаются по записанным файлам; внутри крупного файла
+                # прогресс только обновляется, чтобы отмена не ждала его конца
+                written = cadc_zip.write_entries(zipf, scan, workers, policy, metrics, mmap_input,
+                                                 on_chunk=lambda nbytes: tracker.advance())
+                try:
+                    for file_path, arcname, size, error in written:
+                        if scan.done and tracker.total_files is None:
+                            tracker.total_files = scan.files
+                            tracker.total_bytes = scan.bytes
+                        if file_path is None:
+                            continue
+                        if error:
+                            _emit(status, f"⚠️ Пропуск файла {os.path.basename(arcname)}: {str(error)}")
+                            failed.add(arcname)
+                            cadc_metrics.count(metrics, 'skipped')
+                            continue
+                        tracker.advance(files=1, nbytes=size)
+                        cadc_metrics.count(metrics, 'files')
+                        cadc_metrics.count(metrics, 'bytes', size)
+                finally:
+                    # При ошибке не ждем сборщика мусора: пул писателя и
+                    # поток обхода останавливаются сразу
+                    written.close()
+                    scan.stop()
+                tracker.finish()
+                if metrics is not None and scan.elapsed is not None:
+                    metrics.record('walk', scan.elapsed)
+
+                if deduplicator:
+                    for arcname in deduplicator.drop_failed(failed):
+                        _emit(status, f"⚠️ Пропуск файла {os.path.basename(arcname)}: оригинал не записан")
+                    if deduplicator.index:
+                        index = {name.replace(os.sep, '/'): original.replace(os.sep, '/')
+                                 for name, original in deduplicator.index.items()}
+                        with cadc_metrics.stage(metrics, 'write', cadc_zip.DEDUP_INDEX_NAME):
+                            zipf.writestr(cadc_zip.DEDUP_INDEX_NAME, json.dumps(index))
+                        cadc_metrics.count(metrics, 'duplicates', len(index))
+                        _emit(status, f"♻️ Дубликатов: {len(index)}, "
+                                      f"сэкономлено {deduplicator.saved_bytes / (1024 * 1024):.1f} МБ")
+
+        cadc_metrics.count(metrics, 'archive_bytes', os.path.getsize(archive_path))
+        _emit(status, f"✅ Архив успешно создан: {encoded_ok}.cp")
+        return archive_path, ok_str, public_key
+
+    except Exception:
+        if archive_path and os.path.exists(archive_path):
+            try:
+                os.remove(archive_path)
+            except:
+                pass
+        raise
+
+# Ошибки, которыми pyzipper сообщает о неверном ключе или порче данных
+INTEGRITY_ERRORS = (pyzipper.BadZipFile, KeyError, RuntimeError, zlib.error, EOFError, ValueError)
+
+def archive_key(selected_path, params_file, status=None, metrics=None):
+    # Ключ архива по OK, закодированному в имени файла
+    if not selected_path or not os.path.exists(selected_path):
+        raise Exception("Выбранный архив не существует")
+
+    if not str(selected_path).endswith('.cp'):
+        raise Exception("Неверный формат архива")
+
+    # Получаем зашифрованный OK из имени файла
+    encoded_ok = os.path.basename(selected_path).replace('.cp', '')
+
+    _emit(status, "⌛ Расшифровка архива...")
+    ok_str = archive_name_to_ok(encoded_ok)
+
+    # Читаем параметры и генерируем ключ
+    with cadc_metrics.stage(metrics, 'params'):
+        params = read_params(params_file)
+    with cadc_metrics.stage(metrics, 'key'):
+        return derive_archive_key(params, ok_str)
+
+def new_extract_dir(selected_path):
+    # Создаем папку с именем архива (без .cp) рядом с архивом
+    archive_name = os.path.splitext(os.path.basename(selected_path))[0]
+    extract_path = Path(selected_path).parent / f"CADC_{archive_name}"
+
+    # Если папка существует, добавляем номер
+    counter = 1
+    original_path = extract_path
+    while os.path.exists(extract_path):
+        extract_path = f"{original_path}_{counter}"
+        counter += 1
+
+    os.makedirs(extract_path)
+    return extract_path
+
+def verify_archive_key(zipf, public_key, infos, metrics=None):
+    # Проверяем ключ один раз, без чтения содержимого; возвращаем индекс дубликатов
+    zipf.setpassword(str(public_key).encode())
+    try:
+        with cadc_metrics.stage(metrics, 'verify'):
+            if not cadc_zip.check_password(zipf, infos):
+                raise Exception("Неверный ключ")
+            return cadc_zip.read_dedup_index(zipf)
+    except INTEGRITY_ERRORS:
+        raise Exception("Неверный ключ или поврежденный архив")
+
+def _count_extracted(metrics, size):
+    cadc_metrics.count(metrics, 'files')
+    cadc_metrics.count(metrics, 'bytes', size)
+
+def _extract_timed(zipf, info, extract_path, buffer_size, on_chunk, metrics, name=None):
+    with cadc_metrics.stage(metrics, 'extract', name or info.filename):
+        cadc_zip.extract_member(zipf, info, extract_path, buffer_size, on_chunk, name=name)
+    if not info.is_dir():
+        _count_extracted(metrics, info.file_size)
+
+def unpack(selected_path, params_file, status=None, buffer_size=cadc_zip.EXTRACT_BUFFER_SIZE,
+           progress=None, progress_rate=PROGRESS_RATE, metrics=None):
+    public_key = archive_key(selected_path, params_file, status, metrics)
+
+    # Используем директорию архива для распаковки
+    archive_dir = Path(selected_path).parent
+
+    try:
+        with pyzipper.AESZipFile(selected_path, 'r') as zipf:
+            # Считываем список элементов из центрального каталога
+            infos = cadc_zip.content_infos(zipf)
+            file_list = [info.filename for info in infos]
+            if not file_list:
+                raise Exception("Архив пуст")
+
+            duplicates = verify_archive_key(zipf, public_key, infos, metrics)
+            file_list += list(duplicates)
+
+            _emit(status, "⌛ Распаковка архива...")
+            created_path = None
+            # Определяем путь для распаковки
+            if len(file_list) > 1:
+                extract_path = created_path = new_extract_dir(selected_path)
+                _emit(status, f"⌛ Создана папка для распаковки: {os.path.basename(extract_path)}")
+            else:
+                extract_path = archive_dir
+
+            # Распаковываем файлы за один проход; при ошибке убираем
+            # созданную папку, чтобы не оставлять частичный результат
+            tracker = Progress("Распаковка", progress, status, len(file_list),
+                               sum(info.file_size for info in infos)
+                               + sum(zipf.getinfo(original).file_size for original in duplicates.values()),
+                               progress_rate)
+            on_chunk = lambda nbytes: tracker.advance(nbytes=nbytes)
+            try:
+                for info in infos:
+                    _extract_timed(zipf, info, extract_path, buffer_size, on_chunk, metrics)
+                    tracker.advance(files=1)
+                # Дубликаты восстанавливаем копированием уже распакованных оригиналов
+                for name, original in duplicates.items():
+                    with cadc_metrics.stage(metrics, 'extract', name):
+                        size = cadc_zip.restore_duplicate(zipf, name, original, extract_path)
+                    tracker.advance(files=1, nbytes=size)
+                    _count_extracted(metrics, size)
+                tracker.finish()
+            except BaseException as e:
+                if created_path:
+                    shutil.rmtree(created_path, ignore_errors=True)
+                if isinstance(e, INTEGRITY_ERRORS):
+                    raise Exception("Неверный ключ или поврежденный архив")
+                raise
+
+    except Exception as e:
+        raise Exception(f"Ошибка при распаковке: {str(e)}")
+
+    return extract_path, file_list
+
+def list_archive(selected_path, params_file=None):
+    # Содержимое архива из центрального каталога, без ключа и расшифровки.
+    # С файлом параметров добавляются дубликаты из индекса дедупликации
+    # (он зашифрован, но мал)
+    if not selected_path or not os.path.exists(selected_path):
+        raise Exception("Выбранный архив не существует")
+    try:
+        with pyzipper.AESZipFile(selected_path, 'r') as zipf:
+            infos = cadc_zip.content_infos(zipf)
+            entries = [{
+                'name': info.filename,
+                'size': info.file_size,
+                'compressed_size': info.compress_size,
+                'is_dir': info.is_dir(),
+                'date_time': "%04d-%02d-%02d %02d:%02d:%02d" % info.date_time,
+                'duplicate_of': None,
+            } for info in infos]
+            if params_file is not None and cadc_zip.DEDUP_INDEX_NAME in zipf.NameToInfo:
+                duplicates = verify_archive_key(zipf, archive_key(selected_path, params_file), infos)
+                for name, original in duplicates.items():
+                    info = zipf.getinfo(original)
+                    entries.append({
+                        'name': name,
+                        'size': info.file_size,
+                        'compressed_size': 0,
+                        'is_dir': False,
+                        'date_time': "%04d-%02d-%02d %02d:%02d:%02d" % info.date_time,
+                        'duplicate_of': original,
+                    })
+    except pyzipper.BadZipFile:
+        raise Exception("Неверный формат архива")
+    return entries
+
+def extract(selected_path, params_file, patterns, extract_path=None, status=None,
+            buffer_size=cadc_zip.EXTRACT_BUFFER_SIZE, progress=None, progress_rate=PROGRESS_RATE,
+            metrics=None):
+    # Выборочная распаковка: расшифровываются только элементы, подходящие
+    # под шаблоны (см. cadc_zip.match_members). Без extract_path файлы
+    # попадают в новую папку CADC_<имя архива>
+    public_key = archive_key(selected_path, params_file, status, metrics)
+    try:
+        with pyzipper.AESZipFile(selected_path, 'r') as zipf:
+            infos = cadc_zip.content_infos(zipf)
+            duplicates = verify_archive_key(zipf, public_key, infos, metrics)
+            names = cadc_zip.match_members([info.filename for info in infos] + list(duplicates), patterns)
+            if not names:
+                raise Exception("Нет файлов, подходящих под шаблон")
+
+            created_path = None
+            if extract_path is None:
+                extract_path = created_path = new_extract_dir(selected_path)
+            selected = [zipf.getinfo(name) for name in names if name not in duplicates]
+            extracted = {info.filename for info in selected}
+            copies = [(name, duplicates[name]) for name in names if name in duplicates]
+            tracker = Progress("Распаковка", progress, status, len(names),
+                               sum(info.file_size for info in selected)
+                               + sum(zipf.getinfo(original).file_size for _, original in copies),
+                               progress_rate)
+            on_chunk = lambda nbytes: tracker.advance(nbytes=nbytes)
+            try:
+                for info in selected:
+                    _extract_timed(zipf, info, extract_path, buffer_size, on_chunk, metrics)
+                    tracker.advance(files=1)
+                for name, original in copies:
+                    if original in extracted:
+                        with cadc_metrics.stage(metrics, 'extract', name):
+                            size = cadc_zip.restore_duplicate(zipf, name, original, extract_path)
+                        tracker.advance(files=1, nbytes=size)
+                        _count_extracted(metrics, size)
+                    else:
+                        # Оригинал не выбран — распаковываем его сразу под именем дубликата
+                        _extract_timed(zipf, zipf.getinfo(original), extract_path, buffer_size,
+                                       on_chunk, metrics, name=name)
+                        tracker.advance(files=1)
+                tracker.finish()
+            except BaseException as e:
+                if created_path:
+                    shutil.rmtree(created_path, ignore_errors=True)
+                if isinstance(e, INTEGRITY_ERRORS):
+                    raise Exception("Неверный ключ или поврежденный архив")
+                raise
+
+    except Exception as e:
+        raise Exception(f"Ошибка при распаковке: {str(e)}")
+
+    return extract_path, names
+
+# Инкрементальный режим: архив обновляется на месте. Новые и измененные
+# файлы дописываются в конец, старые версии и удаленные файлы только
+# убираются из центрального каталога (остаются мертвыми байтами), а
+# неизмененные элементы не трогаются вовсе. Какие файлы изменились,
+# решает манифест (путь, размер, mtime, sha256), лежащий в самом архиве
+# в зашифрованном виде. Когда мертвых байт становится больше доли
+# COMPACT_RATIO архива, он уплотняется копированием живых элементов
+# без расшифровки.
+
+COMPACT_RATIO = 0.5
+MANIFEST_VERSION = 1
+
+def stream_digest(stream):
+    digest = hashlib.sha256()
+    while True:
+        chunk = stream.read(cadc_zip.CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def file_digest(file_path):
+    with open(file_path, 'rb') as file:
+        return stream_digest(file)
+
+def read_manifest(zipf):
+    if cadc_zip.MANIFEST_NAME not in zipf.NameToInfo:
+        return {}
+    manifest = json.loads(zipf.read(cadc_zip.MANIFEST_NAME))
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest['files']
+
+def _member_unchanged(zipf, file_path, stat, record, info):
+    # Возвращает (не изменился ли файл, новая запись манифеста)
+    size = stat.st_size
+    if record and record['size'] == size and record['mtime_ns'] == stat.st_mtime_ns:
+        return info is not None, record
+    digest = file_digest(file_path)
+    new_record = {'size': size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+    if info is None:
+        return False, new_record
+    if record:
+        return record['sha256'] == digest, new_record
+    # Архив без манифеста: CRC в AE-2 не хранится, поэтому при совпадении
+    # размера сверяем хеш расшифрованного элемента (без повторного сжатия)
+    if info.file_size != size:
+        return False, new_record
+    with zipf.open(info) as member:
+        return stream_digest(member) == digest, new_record
+
+def update(selected_path, archive_path, params_file, status=None, workers=1, compression=None,
+           compact_ratio=COMPACT_RATIO, progress=None, progress_rate=PROGRESS_RATE, metrics=None,
+           mmap_input=False):
+    # Обновляет архив archive_path содержимым selected_path.
+    # Возвращает сводку: added, replaced, removed, unchanged, compacted
+    if not selected_path or not os.path.exists(selected_path):
+        raise Exception("Выбранный путь не существует")
+    if not archive_path or not os.path.exists(archive_path):
+        raise Exception("Выбранный архив не существует")
+    if not str(archive_path).endswith('.cp') or not pyzipper.is_zipfile(archive_path):
+        raise Exception("Неверный формат архива")
+
+    encoded_ok = os.path.basename(archive_path).replace('.cp', '')
+    ok_str = archive_name_to_ok(encoded_ok)
+    _emit(status, "⌛ Генерация ключа...")
+    with cadc_metrics.stage(metrics, 'params'):
+        params = read_params(params_file)
+    with cadc_metrics.stage(metrics, 'key'):
+        public_key = derive_archive_key(params, ok_str)
+    policy = cadc_zip.CompressionPolicy.parse(compression)
+
+    source = Path(selected_path)
+    if source.is_file():
+        stat = source.stat()
+        entries = [(source, source.name, stat.st_size)]
+    else:
+        entries = scan_tree(source)
+
+    summary = {'added': 0, 'replaced': 0, 'removed': 0, 'unchanged': 0, 'compacted': False}
+    # До этого размера файл не меняется: новые байты пишутся только после
+    # него, так что при ошибке архив восстанавливается обрезкой
+    original_size = os.path.getsize(archive_path)
+    zipf = pyzipper.AESZipFile(archive_path, 'a', compression=pyzipper.ZIP_DEFLATED,
+                               encryption=pyzipper.WZ_AES)
+    try:
+        zipf.setpassword(str(public_key).encode())
+        zipf.setencryption(pyzipper.WZ_AES, nbits=256)
+        try:
+            with cadc_metrics.stage(metrics, 'verify'):
+                if not cadc_zip.check_password(zipf, cadc_zip.content_infos(zipf)):
+                    raise Exception("Неверный ключ")
+                manifest = read_manifest(zipf)
+        except INTEGRITY_ERRORS:
+            raise Exception("Неверный ключ или поврежденный архив")
+        zipf.start_dir = original_size
+
+        _emit(status, "⌛ Поиск изменений...")
+        # Обход вместе со сверкой с манифестом (и хешированием измененных)
+        walk_started = time.perf_counter()
+        new_manifest = {}
+        seen = set()
+        changed = []
+        for file_path, arcname, size in entries:
+            arcname = arcname.replace(os.sep, '/')
+            seen.add(arcname)
+            info = zipf.NameToInfo.get(arcname)
+            if file_path is None:
+                if info is None:
+                    changed.append((None, arcname, None))
+                    summary['added'] += 1
+                continue
+            try:
+                stat = os.stat(file_path)
+                unchanged, record = _member_unchanged(zipf, file_path, stat, manifest.get(arcname), info)
+            except OSError as e:
+                _emit(status, f"⚠️ Пропуск файла {os.path.basename(arcname)}: {str(e)}")
+                # Недоступный файл не удаляем из архива
+                if arcname in manifest:
+                    new_manifest[arcname] = manifest[arcname]
+                continue
+            new_manifest[arcname] = record
+            if unchanged:
+                summary['unchanged'] += 1
+                continue
+            if info is not None:
+                cadc_zip.remove_member(zipf, info)
+                summary['replaced'] += 1
+            else:
+                summary['added'] += 1
+            changed.append((file_path, arcname, stat.st_size))
+
+        for info in cadc_zip.content_infos(zipf):
+            if info.filename not in seen:
+                cadc_zip.remove_member(zipf, info)
+                summary['removed'] += 1
+        if metrics is not None:
+            metrics.record('walk', time.perf_counter() - walk_started)
+
+        if changed:
+            tracker = Progress("Обновление", progress, status,
+                               sum(1 for entry in changed if entry[0] is not None),
+                               sum(entry[2] or 0 for entry in changed), progress_rate)
+            written = cadc_zip.write_entries(zipf, changed, workers, policy, metrics, mmap_input,
+                                             on_chunk=lambda nbytes: tracker.advance())
+            for file_path, arcname, size, error in written:
+                if error:
+                    raise error
+                if file_path is not None:
+                    tracker.advance(files=1, nbytes=size)
+                    cadc_metrics.count(metrics, 'files')
+                    cadc_metrics.count(metrics, 'bytes', size)
+            tracker.finish()
+
+        # Дубликаты из индекса дедупликации в каталоге отсутствуют, поэтому
+        # выше они уже дописаны полноценными элементами; индекс больше не нужен
+        if cadc_zip.DEDUP_INDEX_NAME in zipf.NameToInfo:
+            cadc_zip.remove_member(zipf, zipf.NameToInfo[cadc_zip.DEDUP_INDEX_NAME])
+
+        if new_manifest != manifest or zipf._didModify:
+            if cadc_zip.MANIFEST_NAME in zipf.NameToInfo:
+                cadc_zip.remove_member(zipf, zipf.NameToInfo[cadc_zip.MANIFEST_NAME])
+            zipf.writestr(cadc_zip.MANIFEST_NAME,
+                          json.dumps({'version': MANIFEST_VERSION, 'files': new_manifest}))
+        zipf.close()
+    except BaseException as e:
+        # Центральный каталог не пишем и отрезаем все дописанное
+        zipf._didModify = False
+        zipf.close()
+        with open(archive_path, 'r+b') as file:
+            file.truncate(original_size)
+        # Элемент архива без манифеста мог оказаться поврежден при сверке
+        if isinstance(e, INTEGRITY_ERRORS):
+            raise Exception("Неверный ключ или поврежденный архив")
+        raise
+
+    with pyzipper.AESZipFile(archive_path, 'r') as zipf:
+        dead = cadc_zip.dead_bytes(zipf)
+    if dead > compact_ratio * os.path.getsize(archive_path):
+        _emit(status, "⌛ Уплотнение архива...")
+        compact(archive_path)
+        summary['compacted'] = True
+
+    _emit(status, f"✅ Архив обновлен: +{summary['added']} ~{summary['replaced']} "
+                  f"-{summary['removed']}, без изменений {summary['unchanged']}")
+    return summary
+
+def compact(archive_path):
+    # Переписывает архив без мертвых байт. Элементы копируются как есть,
+    # поэтому ключ не нужен
+    part_path = f"{archive_path}.cadc-part"
+    try:
+        with pyzipper.AESZipFile(archive_path, 'r') as source, \
+                pyzipper.AESZipFile(part_path, 'w') as target:
+            for info in source.infolist():
+                cadc_zip.copy_raw_member(source, target, info)
+        os.replace(part_path, archive_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+# Копирование между архивами: элементы переносятся из одного .cp в другой
+# без распаковки на диск и без повторного сжатия. Если ключ у архивов
+# общий, байты элемента копируются как есть; если разный, данные
+# расшифровываются и сразу шифруются новым ключом (cadc_zip.transfer_member).
+# Так архивы объединяются и разделяются со скоростью диска.
+
+def _open_copy_source(stack, source_path, params_file, patterns, status, metrics):
+    # (архив, ключ, выбранные элементы, выбранные дубликаты {имя: оригинал})
+    if not str(source_path).endswith('.cp') or not os.path.exists(source_path) \
+            or not pyzipper.is_zipfile(source_path):
+        raise Exception(f"Неверный формат архива: {os.path.basename(source_path)}")
+    public_key = archive_key(source_path, params_file, status, metrics)
+    source = stack.enter_context(pyzipper.AESZipFile(source_path, 'r'))
+    infos = cadc_zip.content_infos(source)
+    duplicates = verify_archive_key(source, public_key, infos, metrics)
+    names = [info.filename for info in infos] + list(duplicates)
+    if patterns:
+        names = cadc_zip.match_members(names, patterns)
+    members = [source.getinfo(name) for name in names if name not in duplicates]
+    copies = {name: duplicates[name] for name in names if name in duplicates}
+    return source, public_key, members, copies
+
+def copy_archive(sources, params_file, target=None, patterns=None, target_params_file=None,
+                 keep_key=False, status=None, progress=None, progress_rate=PROGRESS_RATE, metrics=None):
+    # Копирует элементы архивов sources (путь или список путей) в target:
+    #   существующий .cp — элементы дописываются в него (при ошибке архив
+    #     обрезается до исходного размера, как в update);
+    #   папка или None (папка первого архива) — создается новый архив с
+    #     новым OK, а с keep_key — с OK и именем первого архива.
+    # patterns — только подходящие элементы (см. cadc_zip.match_members);
+    # target_params_file — параметры ключа target, по умолчанию params_file.
+    # Элементы, чье имя в target уже занято, пропускаются. Манифест
+    # инкрементального режима не копируется, индексы дедупликации
+    # сливаются. Возвращает (путь target, сводка: copied, reencrypted,
+    # skipped, duplicates)
+    if isinstance(sources, (str, os.PathLike)):
+        sources = [sources]
+    sources = [str(source) for source in sources]
+    if not sources:
+        raise Exception("Не выбраны архивы для копирования")
+    existing = target is not None and str(target).endswith('.cp')
+    if existing:
+        if not os.path.exists(target) or not pyzipper.is_zipfile(target):
+            raise Exception("Неверный формат архива")
+        if any(os.path.realpath(source) == os.path.realpath(target) for source in sources):
+            raise Exception("Архив нельзя скопировать сам в себя")
+    else:
+        target_dir = Path(target) if target is not None else Path(sources[0]).parent
+        if not target_dir.is_dir():
+            raise Exception("Папка назначения не существует")
+
+    summary = {'copied': 0, 'reencrypted': 0, 'skipped': 0, 'duplicates': 0}
+    with ExitStack() as stack:
+        # Ключи всех источников проверяются до того, как что-то записано
+        opened = [_open_copy_source(stack, source, params_file, patterns, status, metrics)
+                  for source in sources]
+        if not any(members or copies for _, _, members, copies in opened):
+            raise Exception("Нет файлов, подходящих под шаблон" if patterns else "Архивы пусты")
+
+        with cadc_metrics.stage(metrics, 'params'):
+            target_params = read_params(target_params_file or params_file)
+        if existing:
+            target_path = Path(target)
+            ok_str = archive_name_to_ok(target_path.name.replace('.cp', ''))
+        elif keep_key:
+            target_path = target_dir / os.path.basename(sources[0])
+            ok_str = archive_name_to_ok(target_path.name.replace('.cp', ''))
+        else:
+            ok_str = generate_ok()
+            while (target_dir / f"{ok_to_archive_name(ok_str)}.cp").exists():
+                ok_str = generate_ok()
+            target_path = target_dir / f"{ok_to_archive_name(ok_str)}.cp"
+        if not existing and target_path.exists():
+            raise Exception(f"Архив уже существует: {target_path.name}")
+        _emit(status, "⌛ Генерация ключа...")
+        with cadc_metrics.stage(metrics, 'key'):
+            target_key = derive_archive_key(target_params, ok_str)
+
+        if existing:
+            original_size = os.path.getsize(target_path)
+        # Новый архив создается эксклюзивно, как pack без overwrite
+        zipf = pyzipper.AESZipFile(target_path, 'a' if existing else 'x', compression=pyzipper.ZIP_DEFLATED,
+                                   encryption=pyzipper.WZ_AES)
+        try:
+            zipf.setpassword(str(target_key).encode())
+            zipf.setencryption(pyzipper.WZ_AES, nbits=256)
+            index = {}
+            if existing:
+                try:
+                    with cadc_metrics.stage(metrics, 'verify'):
+                        if not cadc_zip.check_password(zipf, cadc_zip.content_infos(zipf)):
+                            raise Exception("Неверный ключ")
+                        index = cadc_zip.read_dedup_index(zipf)
+                except INTEGRITY_ERRORS:
+                    raise Exception("Неверный ключ или поврежденный архив")
+                zipf.start_dir = original_size
+            taken = set(zipf.NameToInfo) | set(index)
+            index_size = len(index)
+
+            _emit(status, "⌛ Копирование элементов...")
+            tracker = Progress("Копирование", progress, status,
+                               sum(len(members) + len(copies) for _, _, members, copies in opened),
+                               sum(info.compress_size for _, _, members, _ in opened for info in members),
+                               progress_rate)
+
+            def transfer(source, info, source_pwd, name):
+                if name in taken:
+                    _emit(status, f"⚠️ Пропуск файла {os.path.basename(name.rstrip('/'))}: "
+                                  f"уже есть в архиве")
+                    summary['skipped'] += 1
+                    cadc_metrics.count(metrics, 'skipped')
+                    return False
+                with cadc_metrics.stage(metrics, 'reencrypt' if source_pwd else 'copy', name):
+                    cadc_zip.transfer_member(source, zipf, info, None if name == info.filename else name,
+                                             source_pwd, on_chunk=lambda nbytes: tracker.advance())
+                taken.add(name)
+                summary['reencrypted' if source_pwd else 'copied'] += 1
+                if not info.is_dir():
+                    cadc_metrics.count(metrics, 'files')
+                    cadc_metrics.count(metrics, 'bytes', info.file_size)
+                return True
+
+            for source, source_key, members, copies in opened:
+                # Ключ тот же — байты элементов годятся как есть
+                source_pwd = None if str(source_key) == str(target_key) else str(source_key).encode()
+                copied = set()
+                for info in members:
+                    if transfer(source, info, source_pwd, info.filename):
+                        copied.add(info.filename)
+                    tracker.advance(files=1, nbytes=info.compress_size)
+                for name, original in copies.items():
+                    if original in copied and name not in taken:
+                        index[name] = original
+                        taken.add(name)
+                        summary['duplicates'] += 1
+                        cadc_metrics.count(metrics, 'duplicates')
+                    else:
+                        # Оригинал не выбран или пропущен — переносим его
+                        # под именем дубликата (занятое имя пропускается)
+                        transfer(source, source.getinfo(original), source_pwd, name)
+                    tracker.advance(files=1)
+            tracker.finish()
+
+            if len(index) != index_size:
+                if cadc_zip.DEDUP_INDEX_NAME in zipf.NameToInfo:
+                    cadc_zip.remove_member(zipf, zipf.NameToInfo[cadc_zip.DEDUP_INDEX_NAME])
+                with cadc_metrics.stage(metrics, 'write', cadc_zip.DEDUP_INDEX_NAME):
+                    zipf.writestr(cadc_zip.DEDUP_INDEX_NAME, json.dumps(index))
+            zipf.close()
+        except BaseException as e:
+            # Центральный каталог не пишем: существующий архив обрезаем до
+            # исходного размера, новый удаляем
+            zipf._didModify = False
+            zipf.close()
+            if existing:
+                with open(target_path, 'r+b') as file:
+                    file.truncate(original_size)
+            elif os.path.exists(target_path):
+                os.remove(target_path)
+            if isinstance(e, INTEGRITY_ERRORS):
+                raise Exception("Неверный ключ или поврежденный архив")
+            raise
+
+    cadc_metrics.count(metrics, 'archive_bytes', os.path.getsize(target_path))
+    _emit(status, f"✅ Скопировано в {target_path.name}: {summary['copied']} как есть, "
+                  f"{summary['reencrypted']} перешифровано, пропущено {summary['skipped']}")
+    return target_path, summary
+
+def unpack_message(extract_path, file_list):
+    success_message = "Архив успешно расшифрован и распакован"
+    if len(file_list) > 1:
+        success_message += f" в папку {os.path.basename(extract_path)}"
+    else:
+        success_message += f" в {os.path.basename(extract_path)}"
+    return success_message
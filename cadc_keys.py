@@ -0,0 +1,478 @@
+import decimal
+import json
+import functools
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal, Context, ROUND_HALF_EVEN, ROUND_DOWN, MAX_EMAX, MIN_EMIN
+from pathlib import Path
+
+# Движок генерации ключей CADC.
+#
+# Ключ — это последние key_len цифр мантиссы PK ** e, округленной до prec
+# знаков. Нужны именно младшие цифры, поэтому результат в любом случае
+# считается на полную точность prec. Экономия достигается иначе:
+#   * libmpdec считает pow как exp(e * ln(PK)) на рабочей точности
+#     prec + 4 + MPD_EXPDIGITS. Мы повторяем ту же цепочку операций и
+#     кешируем ln(PK): на 5000 знаках ln занимает ~3/4 времени pow,
+#     а от OK он не зависит. Результат совпадает с pow побитно.
+#   * Опционально — двоичные бэкенды gmpy2/mpmath (MPFR на порядки быстрее
+#     libmpdec). Результат проверяется на близость к границе округления,
+#     в спорных случаях используется десятичный бэкенд.
+#
+# Глобальный контекст decimal (getcontext) движок не читает и не меняет:
+# каждая операция идет в явном Context, поэтому ключи можно выводить из
+# нескольких потоков одновременно. Окно key_len цифр берется из результата
+# арифметически — без str() на prec знаков: у decimal через quantize
+# (key_window), у gmpy2/mpmath — делением целой мантиссы (mantissa_window).
+
+# MPD_EXPDIGITS: 19 на 64-битных сборках libmpdec, 10 на 32-битных
+MPD_EXPDIGITS = 19 if decimal.MAX_PREC > 425000000 else 10
+POW_GUARD_DIGITS = 4 + MPD_EXPDIGITS
+# Цепочку ln/exp повторяем только для C-реализации decimal (libmpdec)
+HAVE_LIBMPDEC = hasattr(decimal, '__libmpdec_version__')
+
+BACKENDS = ('decimal', 'gmpy2', 'mpmath', 'auto')
+
+default_corpus_path = Path(__file__).with_name("cadc_key_corpus.json")
+
+def reference_pow(base, exponent, prec):
+    # Эталон: ровно то, что делал исходный код через getcontext().prec
+    return Context(prec=prec).power(base, exponent)
+
+def key_from_power(value, prec, key_len):
+    str_key = str(value)
+    integer_part, fractional_part = str_key.split(".")
+    key = integer_part + fractional_part
+    return key[prec - key_len: prec]
+
+# В обычной записи str() у чисел 10^-6 <= x < 1 впереди стоят нули "0.000…",
+# и они входят в ключ key_from_power
+PLAIN_LEADING_ZEROS = 6
+
+def key_window(value, prec, key_len):
+    # То же, что key_from_power, для значения ровно из prec значащих цифр.
+    # Окно сдвигается к единицам (scaleb меняет только порядок), а младшие
+    # key_len цифр целой части отделяются отбрасыванием разрядов quantize
+    if not value.is_finite() or value <= 0 or prec < 2:
+        return key_from_power(value, prec, key_len)
+    adjusted = value.adjusted()
+    zeros = -adjusted if -PLAIN_LEADING_ZEROS <= adjusted < 0 else 0
+    if prec - key_len < zeros:
+        return key_from_power(value, prec, key_len)
+    context = Context(prec=prec + PLAIN_LEADING_ZEROS, rounding=ROUND_DOWN, Emax=MAX_EMAX, Emin=MIN_EMIN)
+    scaled = context.scaleb(value, prec - zeros - 1 - adjusted)
+    # Цифр меньше prec (точный результат) — str() запишет их иначе
+    if not scaled.same_quantum(Decimal(f"1E-{zeros}")):
+        return key_from_power(value, prec, key_len)
+    low = context.subtract(scaled, context.quantize(scaled, Decimal(f"1E{key_len}")))
+    return f"{int(low):0{key_len}d}"
+
+def mantissa_window(head, adjusted, prec, key_len):
+    # То же, что key_window, для значения head * 10^(adjusted - prec + 1),
+    # где head — целое ровно из prec цифр
+    zeros = -adjusted if -PLAIN_LEADING_ZEROS <= adjusted < 0 else 0
+    if prec < 2 or prec - key_len < zeros:
+        return key_window(_mantissa_decimal(head, adjusted, prec), prec, key_len)
+    return f"{int(head // 10 ** zeros % 10 ** key_len):0{key_len}d}"
+
+def _mantissa_decimal(head, adjusted, prec):
+    # Decimal(int) точен, scaleb только сдвигает порядок
+    context = Context(prec=prec, Emax=MAX_EMAX, Emin=MIN_EMIN)
+    return context.scaleb(Decimal(int(head)), adjusted - prec + 1)
+
+@functools.lru_cache(maxsize=64)
+def _decimal_ln(base, workprec):
+    return _work_context(workprec).ln(base)
+
+def _work_context(workprec):
+    return Context(prec=workprec, rounding=ROUND_HALF_EVEN, Emax=MAX_EMAX, Emin=MIN_EMIN)
+
+class _PowerSetup:
+    # Все, что зависит только от основания и prec: в пакете (derive_many)
+    # готовится один раз. Проверки особых случаев повторяют ветки libmpdec,
+    # которые тот обрабатывает отдельно
+    def __init__(self, base, prec):
+        self.base = base
+        self.prec = prec
+        self.base_special = (not HAVE_LIBMPDEC or not base.is_finite()
+                             or base <= 0 or base == 1 or len(base.as_tuple().digits) > prec)
+        self.base_str = str(base)
+        self.workprec = prec + POW_GUARD_DIGITS
+        self.work = _work_context(self.workprec)
+        self.result = Context(prec=prec)
+        self._rough_ln = None
+        self._ln = None
+
+    def is_special(self, exponent):
+        return self.base_special or not exponent.is_finite() or exponent == exponent.to_integral_value()
+
+    def rough_ln(self):
+        # ln(PK) с 12 знаками — для оценки порядка e * ln(PK)
+        if self._rough_ln is None:
+            self._rough_ln = Context(prec=12).ln(self.base)
+        return self._rough_ln
+
+    def ln(self):
+        if self._ln is None:
+            self._ln = _decimal_ln(self.base, self.workprec)
+        return self._ln
+
+@functools.lru_cache(maxsize=16)
+def _digit_bounds(ndigits):
+    return 10 ** (ndigits - 1), 10 ** ndigits
+
+def _scaled_mantissa(scale, man, exp2, ndigits):
+    # (M, adjusted): M — первые ndigits десятичных цифр значения
+    # man * 2^exp2 целым числом, adjusted — порядок старшей цифры.
+    # scale(shift) возвращает floor(значение * 10^shift) целым
+    bit_length = int(man.bit_length())
+    # log10 значения по старшим 53 битам мантиссы
+    lead = int(man >> (bit_length - 53)) if bit_length > 53 else int(man) << (53 - bit_length)
+    adjusted = math.floor((math.log2(lead) - 52 + bit_length - 1 + exp2) / math.log2(10))
+    low, high = _digit_bounds(ndigits)
+    while True:
+        mantissa = scale(ndigits - 1 - adjusted)
+        # Рядом со степенью 10 оценка может ошибиться на единицу
+        if mantissa >= high:
+            adjusted += 1
+        elif mantissa < low:
+            adjusted -= 1
+        else:
+            return mantissa, adjusted
+
+def _round_mantissa(mantissa, adjusted, ndigits, prec, safe_digits):
+    # Округление мантиссы из ndigits цифр до prec знаков (ROUND_HALF_EVEN).
+    # (head, adjusted) или None — если приближение слишком близко к
+    # середине и исход спорный
+    tail_digits = ndigits - prec
+    head, tail = divmod(mantissa, 10 ** tail_digits)
+    half = 5 * 10 ** (tail_digits - 1)
+    if abs(tail - half) <= 10 ** (tail_digits - safe_digits):
+        return None
+    if tail > half:
+        head += 1
+        if head == 10 ** prec:
+            head //= 10
+            adjusted += 1
+    return head, adjusted
+
+class KeyEngine:
+    def __init__(self, backend='decimal'):
+        if backend not in BACKENDS:
+            raise ValueError(f"Неизвестный бэкенд: {backend}")
+        if backend == 'auto':
+            backend = 'gmpy2' if _gmpy2() else 'mpmath' if _mpmath() else 'decimal'
+        if backend == 'gmpy2' and not _gmpy2():
+            raise ImportError("Бэкенд gmpy2 недоступен: модуль не установлен")
+        if backend == 'mpmath' and not _mpmath():
+            raise ImportError("Бэкенд mpmath недоступен: модуль не установлен")
+        self.backend = backend
+
+    def power(self, base, exponent, prec):
+        setup = _PowerSetup(Decimal(base), prec)
+        if setup.is_special(exponent):
+            return reference_pow(setup.base, exponent, prec)
+        if self.backend != 'decimal':
+            rounded = self._binary_power(setup, exponent)
+            if rounded is not None:
+                return _mantissa_decimal(*rounded, prec)
+        return self._decimal_power(setup, exponent)
+
+    def derive(self, PK, exponent, prec, key_len):
+        return self.derive_many(PK, [exponent], prec, key_len)[0]
+
+    def derive_many(self, PK, exponents, prec, key_len):
+        # Ключи для набора показателей при одном PK. Проверки основания,
+        # грубый ln(PK), рабочий контекст и ln(PK) на рабочей точности
+        # готовятся один раз на пакет (_PowerSetup). На показатель остаются
+        # exp(e * ln PK) и окно цифр — это почти все время вывода ключа,
+        # так что пакет быстрее отдельных вызовов лишь на несколько процентов
+        setup = _PowerSetup(Decimal(PK), prec)
+        keys = []
+        for exponent in exponents:
+            if setup.is_special(exponent):
+                keys.append(key_from_power(reference_pow(setup.base, exponent, prec), prec, key_len))
+                continue
+            # Остальные ветки дают ровно prec значащих цифр
+            rounded = self._binary_power(setup, exponent) if self.backend != 'decimal' else None
+            if rounded is not None:
+                keys.append(mantissa_window(*rounded, prec, key_len))
+            else:
+                keys.append(key_window(self._decimal_power(setup, exponent), prec, key_len))
+        return keys
+
+    def _decimal_power(self, setup, exponent):
+        work = setup.work
+        return setup.result.plus(work.exp(work.multiply(setup.ln(), exponent)))
+
+    def _binary_power(self, setup, exponent):
+        # Порядок величины e * ln(PK): от него зависит погрешность libmpdec
+        scale = Context(prec=12).multiply(setup.rough_ln(), exponent)
+        scale_digits = max(1, scale.adjusted() + 1)
+        # Погрешность libmpdec ~ |e * ln(PK)| * 10^-POW_GUARD_DIGITS единиц
+        # последнего знака; спорными считаем результаты ближе запаса к середине
+        safe_digits = POW_GUARD_DIGITS - scale_digits - 3
+        if safe_digits < 4:
+            return None
+        ndigits = setup.prec + safe_digits + 10
+        bits = int((ndigits + scale_digits + 10) * 3.3219280948873626) + 64
+        if self.backend == 'gmpy2':
+            mantissa, adjusted = _gmpy2_power_mantissa(setup.base_str, str(exponent), bits, ndigits)
+        else:
+            mantissa, adjusted = _mpmath_power_mantissa(setup.base_str, str(exponent), bits, ndigits)
+        return _round_mantissa(mantissa, adjusted, ndigits, setup.prec, safe_digits)
+
+@functools.lru_cache(maxsize=1)
+def _gmpy2():
+    try:
+        import gmpy2
+        return gmpy2
+    except ImportError:
+        return None
+
+@functools.lru_cache(maxsize=1)
+def _mpmath():
+    try:
+        import mpmath
+        return mpmath
+    except ImportError:
+        return None
+
+@functools.lru_cache(maxsize=64)
+def _gmpy2_ln(base, bits):
+    gmpy2 = _gmpy2()
+    with gmpy2.context(precision=bits):
+        return gmpy2.log(gmpy2.mpfr(base))
+
+def _gmpy2_power_mantissa(base, exponent, bits, ndigits):
+    # Сдвиг на степень 10 считается в MPFR на рабочей точности, дальше —
+    # только целое mpz
+    gmpy2 = _gmpy2()
+    with gmpy2.context(precision=bits):
+        value = gmpy2.exp(gmpy2.mpfr(exponent) * _gmpy2_ln(base, bits))
+        man, exp2 = value.as_mantissa_exp()
+        return _scaled_mantissa(lambda shift: gmpy2.mpz(gmpy2.floor(value * gmpy2.mpfr(10) ** shift)),
+                                man, int(exp2), ndigits)
+
+@functools.lru_cache(maxsize=64)
+def _mpmath_ln(base, bits):
+    mpmath = _mpmath()
+    with mpmath.mp.workprec(bits):
+        return mpmath.log(mpmath.mpf(base))
+
+def _mpmath_power_mantissa(base, exponent, bits, ndigits):
+    mpmath = _mpmath()
+    with mpmath.mp.workprec(bits):
+        value = mpmath.exp(mpmath.mpf(exponent) * _mpmath_ln(base, bits))
+        # _mpf_ — (знак, man, exp, число бит man): значение man * 2^exp
+        _, man, exp2, _ = value._mpf_
+        return _scaled_mantissa(lambda shift: int(mpmath.floor(value * mpmath.mpf(10) ** shift)),
+                                man, int(exp2), ndigits)
+
+def clear_ln_caches():
+    # ln(PK) кешируется на уровне модуля по (PK, точность) для всех
+    # движков; сброс нужен замерам "холодного" первого ключа
+    _decimal_ln.cache_clear()
+    _gmpy2_ln.cache_clear()
+    _mpmath_ln.cache_clear()
+
+key_engine = KeyEngine("auto")
+
+def set_backend(backend):
+    global key_engine
+    key_engine = KeyEngine(backend)
+    return key_engine
+
+class KeyCache:
+    # Кеш готовых ключей процесса: (хеш файла параметров, режим, OK) -> ключ.
+    # Ключи хранятся в bytearray и затираются нулями при вытеснении,
+    # истечении TTL и очистке. Строки, уже отданные вызывающему коду,
+    # затереть нельзя — они неизменяемы.
+
+    def __init__(self, maxsize=256, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.derive_seconds = 0.0
+        self.saved_seconds = 0.0
+
+    def configure(self, maxsize=256, ttl=None):
+        if maxsize < 0 or (ttl is not None and ttl <= 0):
+            raise Exception("Размер кеша ключей должен быть >= 0, а время жизни — больше нуля")
+        with self._lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self._shrink()
+
+    def get_or_derive(self, cache_key, derive):
+        key = self.get(cache_key)
+        if key is not None:
+            return key
+        started = time.perf_counter()
+        key = derive()
+        self.put(cache_key, key, time.perf_counter() - started)
+        return key
+
+    def get(self, cache_key):
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and self._expired(entry):
+                self._drop(cache_key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            self.saved_seconds += entry[2]
+            return entry[0].decode()
+
+    def put(self, cache_key, key, cost=0.0):
+        with self._lock:
+            self.derive_seconds += cost
+            if self.maxsize <= 0:
+                return
+            if cache_key in self._entries:
+                self._drop(cache_key)
+            self._entries[cache_key] = (bytearray(key.encode()), time.monotonic(), cost)
+            self._shrink()
+
+    def clear(self):
+        with self._lock:
+            for cache_key in list(self._entries):
+                self._drop(cache_key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'derive_seconds': round(self.derive_seconds, 6),
+                'saved_seconds': round(self.saved_seconds, 6),
+            }
+
+    def _expired(self, entry):
+        return self.ttl is not None and time.monotonic() - entry[1] > self.ttl
+
+    def _shrink(self):
+        while len(self._entries) > max(self.maxsize, 0):
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, cache_key):
+        buffer = self._entries.pop(cache_key)[0]
+        buffer[:] = bytes(len(buffer))
+        self.evictions += 1
+
+# Размер и время жизни кеша задаются переменными окружения (их видят и
+# GUI, и консоль; в консоли есть еще --key-cache-size и --key-cache-ttl):
+#   CADC_KEY_CACHE_SIZE — сколько ключей держать (0 — кеш выключен);
+#   CADC_KEY_CACHE_TTL  — сколько секунд ключ живет в кеше.
+
+def key_cache_settings(environ=None):
+    # (maxsize, ttl) из окружения; без переменных — значения по умолчанию
+    environ = os.environ if environ is None else environ
+    try:
+        maxsize = int(environ.get("CADC_KEY_CACHE_SIZE", 256))
+        ttl = environ.get("CADC_KEY_CACHE_TTL")
+        ttl = float(ttl) if ttl else None
+    except ValueError:
+        raise Exception("Некорректные CADC_KEY_CACHE_SIZE или CADC_KEY_CACHE_TTL: ожидаются числа")
+    return maxsize, ttl
+
+key_cache = KeyCache()
+key_cache.configure(*key_cache_settings())
+
+# Таблица ключей: заранее выведенные ключи архивов одного файла параметров,
+# OK -> ключ. Привязана к хешу параметров: после правки файла таблица
+# просто перестает подходить. Ключи в ней лежат открыто, поэтому таблица
+# создается только по запросу и с правами только для владельца.
+
+KEY_TABLE_VERSION = 1
+
+class KeyTable:
+    def __init__(self, fingerprint, keys=None):
+        self.fingerprint = fingerprint
+        self.keys = dict(keys or {})
+
+    def get(self, ok_str):
+        return self.keys.get(ok_str)
+
+    def update(self, keys):
+        self.keys.update(keys)
+
+    def save(self, path):
+        part_path = f"{path}.cadc-part"
+        descriptor = os.open(part_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, 'w') as file:
+            json.dump({'version': KEY_TABLE_VERSION, 'fingerprint': self.fingerprint,
+                       'mode': 'archive', 'keys': self.keys}, file)
+        os.replace(part_path, path)
+
+    @classmethod
+    def load(cls, path, fingerprint):
+        # None — таблицы нет или она от других параметров
+        try:
+            with open(path, 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != KEY_TABLE_VERSION or data.get('fingerprint') != fingerprint:
+            return None
+        return cls(fingerprint, data.get('keys'))
+
+def params_fingerprint(params):
+    # Хеш содержимого файла параметров; для параметров, собранных
+    # вручную, — хеш самих значений
+    if params.get('hash'):
+        return params['hash']
+    line = repr((params['PK'], params['PK2'], params['prec'], params['key_len']))
+    return hashlib.sha256(line.encode()).hexdigest()
+
+def archive_exponent(ok_str, PK2, prec):
+    # Показатель ключа архива (ArchiveThread): OK + PK2 в Decimal
+    return Context(prec=prec).add(Decimal(ok_str), Decimal(str(float(PK2))))
+
+def public_exponent(OK, PK2):
+    # Показатель ключа окна генерации (CodingThread): сумма во float
+    return Decimal(float(OK) + float(PK2))
+
+# Корпус совместимости: ключи, посчитанные исходным кодом (pow + str + срез)
+
+def corpus_exponent(case):
+    if case['mode'] == 'archive':
+        return archive_exponent(case['OK'], case['PK2'], case['prec'])
+    return public_exponent(case['OK'], case['PK2'])
+
+def build_key_corpus(cases):
+    corpus = []
+    for case in cases:
+        value = reference_pow(Decimal(case['PK']), corpus_exponent(case), case['prec'])
+        corpus.append(dict(case, key=key_from_power(value, case['prec'], case['key_len'])))
+    return corpus
+
+def load_key_corpus(path=None):
+    with open(path or default_corpus_path, 'r') as file:
+        return json.load(file)
+
+def verify_key_corpus(engine=None, path=None, status=None):
+    engine = engine or key_engine
+    mismatches = []
+    for index, case in enumerate(load_key_corpus(path), 1):
+        key = engine.derive(case['PK'], corpus_exponent(case), case['prec'], case['key_len'])
+        if key != case['key']:
+            mismatches.append((case, key))
+        if status:
+            status(f"{index}: {'OK' if key == case['key'] else 'MISMATCH'} prec={case['prec']} OK={case['OK']}")
+    return mismatches
@@ -0,0 +1,156 @@
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+import cadc_keys
+
+# Метрики стадий конвейера CADC.
+#
+#   metrics = cadc_metrics.Metrics(observer=print)
+#   cadc_core.pack(path, params_file, metrics=metrics)
+#   metrics.report()   # {'elapsed', 'stages': {стадия: {'seconds', 'calls'}}, 'counters'}
+#
+# Стадии: params (разбор параметров), key (вывод ключа), walk (обход папки),
+# compress_encrypt (сжатие и шифрование элемента), write (запись готового
+# элемента в архив), verify (проверка ключа), extract (распаковка элемента),
+# copy (перенос элемента в другой архив как есть), reencrypt (перенос с
+# перешифровкой на другой ключ).
+# Обход идет в своем потоке одновременно с архивацией, а при workers > 1
+# сжатие идет в нескольких потоках, поэтому сумма стадий может быть больше
+# elapsed. При последовательной записи pyzipper сжимает, шифрует и пишет
+# элемент одним вызовом — это время целиком попадает в compress_encrypt.
+#
+# В отчет попадает и кеш ключей процесса (key_cache): его размер, а hits,
+# misses и evictions — сколько их набралось за время задачи. Кеш общий,
+# поэтому параллельные задачи видят обращения друг друга.
+#
+# observer получает каждое событие словарем:
+#   {'event': 'stage', 'stage': ..., 'seconds': ..., 'name': элемент или None}
+#   {'event': 'count', 'counter': ..., 'value': ..., 'total': ...}
+# Он вызывается из рабочих потоков и должен быть быстрым.
+
+METRICS_VERSION = 1
+# Сколько мест с наибольшим объемом выделенной памяти сохранять в отчете
+TRACEMALLOC_TOP = 10
+
+class Metrics:
+    def __init__(self, observer=None):
+        self.observer = observer
+        self.stages = {}
+        self.counters = {}
+        self.extra = {}
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._key_cache_start = cadc_keys.key_cache.stats()
+
+    def record(self, stage, seconds, name=None):
+        with self._lock:
+            entry = self.stages.setdefault(stage, {'seconds': 0.0, 'calls': 0})
+            entry['seconds'] += seconds
+            entry['calls'] += 1
+        if self.observer:
+            self.observer({'event': 'stage', 'stage': stage, 'seconds': seconds, 'name': name})
+
+    @contextmanager
+    def stage(self, stage, name=None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started, name)
+
+    def count(self, counter, value=1):
+        with self._lock:
+            total = self.counters[counter] = self.counters.get(counter, 0) + value
+        if self.observer:
+            self.observer({'event': 'count', 'counter': counter, 'value': value, 'total': total})
+
+    def key_cache_report(self):
+        stats = cadc_keys.key_cache.stats()
+        for field in ('hits', 'misses', 'evictions', 'derive_seconds', 'saved_seconds'):
+            stats[field] = round(stats[field] - self._key_cache_start[field], 6)
+        return stats
+
+    def report(self):
+        key_cache = self.key_cache_report()
+        with self._lock:
+            return {
+                'version': METRICS_VERSION,
+                'elapsed': time.monotonic() - self.started,
+                'stages': {stage: dict(entry) for stage, entry in self.stages.items()},
+                'counters': dict(self.counters),
+                'key_cache': key_cache,
+                **self.extra,
+            }
+
+    def save(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.report(), file, ensure_ascii=False, indent=1)
+
+def stage(metrics, name, member=None):
+    # Замер стадии, если метрики включены
+    if metrics is None:
+        return nullcontext()
+    return metrics.stage(name, member)
+
+def count(metrics, counter, value=1):
+    if metrics is not None:
+        metrics.count(counter, value)
+
+@contextmanager
+def profiled(profile_path=None, trace_memory=False, metrics=None):
+    # cProfile текущего потока (статистика — в profile_path, формат pstats)
+    # и/или tracemalloc (пик и самые крупные места выделения — в metrics)
+    profiler = cProfile.Profile() if profile_path else None
+    tracing = trace_memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+        if tracing:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            if metrics is not None:
+                metrics.extra['tracemalloc'] = {
+                    'current_bytes': current,
+                    'peak_bytes': peak,
+                    'top': [{'where': str(stat.traceback), 'bytes': stat.size, 'count': stat.count}
+                            for stat in snapshot.statistics('lineno')[:TRACEMALLOC_TOP]],
+                }
+
+# GUI включает инструментирование переменными окружения (как RUN_CADC_PATH):
+#   CADC_METRICS_DIR — папка для JSON-метрик каждой задачи;
+#   CADC_PROFILE=1   — дополнительно .prof (cProfile) в той же папке;
+#   CADC_TRACEMALLOC=1 — пик памяти и места выделения в метриках.
+
+def job_metrics_from_env():
+    if not os.environ.get("CADC_METRICS_DIR"):
+        return None
+    return Metrics()
+
+@contextmanager
+def instrument_job(action, metrics):
+    # Оборачивает задачу GUI: профилирование по переменным окружения и
+    # сохранение метрик в CADC_METRICS_DIR, даже если задача упала
+    if metrics is None:
+        yield
+        return
+    folder = os.environ["CADC_METRICS_DIR"]
+    os.makedirs(folder, exist_ok=True)
+    base = os.path.join(folder, f"{action}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{threading.get_ident()}")
+    profile_path = f"{base}.prof" if os.environ.get("CADC_PROFILE") == "1" else None
+    try:
+        with profiled(profile_path, os.environ.get("CADC_TRACEMALLOC") == "1", metrics):
+            yield
+    finally:
+        metrics.save(f"{base}.json")
@@ -0,0 +1,197 @@
+import ast
+import hashlib
+import json
+import os
+import threading
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+# Реестр файлов параметров list_CADC.
+#
+# Каждый файл разбирается один раз и проверяется; результат хранится в
+# общем индексе процесса и перечитывается, только если у файла изменились
+# mtime или размер. Список файлов папки тоже кешируется по mtime самой
+# папки, так что все окна GUI и консольные команды берут его из одного
+# места, без отдельных os.listdir.
+#
+# Форматы:
+#   *.txt  — исходный: str(dict) с одинарными кавычками, как пишет FileCreator;
+#   *.json — {"PK": ..., "PK2": ..., "prec": ..., "key_len": ...}.
+# Разобранный индекс можно сохранить в один JSON-файл (INDEX_NAME) рядом с
+# параметрами: новый процесс загружает тысячи наборов одним чтением и
+# разбирает заново только изменившиеся файлы.
+
+PARAM_EXTENSIONS = ('.txt', '.json')
+INDEX_NAME = ".cadc-params-index.json"
+INDEX_VERSION = 1
+
+def validate_params(data, content_hash, name=""):
+    # Приводит значения к типам ключевого движка и проверяет их
+    try:
+        params = {
+            'PK': str(data.get('PK')),
+            'PK2': str(data.get('PK2')),
+            'prec': int(data.get('prec')),
+            'key_len': int(data.get('key_len')),
+            'hash': content_hash,
+        }
+        PK = Decimal(params['PK'])
+        PK2 = Decimal(params['PK2'])
+    except (TypeError, ValueError, InvalidOperation, AttributeError):
+        raise Exception(f"Некорректный файл параметров {name}: ожидаются числа PK, PK2, prec, key_len")
+    if not PK.is_finite() or PK <= 0 or not PK2.is_finite():
+        raise Exception(f"Некорректный файл параметров {name}: PK и PK2 должны быть конечными, PK > 0")
+    if params['prec'] < 1 or not 0 < params['key_len'] <= params['prec']:
+        raise Exception(f"Некорректный файл параметров {name}: нужно 0 < key_len <= prec")
+    return params
+
+def parse_params(text, name=""):
+    content_hash = hashlib.sha256(text.encode()).hexdigest()
+    try:
+        if name.endswith('.json'):
+            data = json.loads(text)
+        else:
+            data = ast.literal_eval(text.replace("'", '"'))
+    except (ValueError, SyntaxError):
+        raise Exception(f"Некорректный файл параметров {name}: не удалось разобрать")
+    if not isinstance(data, dict):
+        raise Exception(f"Некорректный файл параметров {name}: ожидается словарь")
+    return validate_params(data, content_hash, name)
+
+def _signature(stat):
+    return (stat.st_mtime_ns, stat.st_size)
+
+class ParamRegistry:
+    def __init__(self, folder):
+        self.folder = Path(folder)
+        self._lock = threading.Lock()
+        # путь -> ((mtime_ns, размер), параметры)
+        self._entries = {}
+        self._names = None
+        self._folder_signature = None
+        self.parses = 0
+        self.hits = 0
+        self._index_loaded = False
+
+    def _ensure_index(self):
+        # Сохраненный индекс подхватываем при первом обращении
+        if not self._index_loaded:
+            self._index_loaded = True
+            self.load_index()
+
+    def get(self, params_file):
+        # Параметры файла; копия, чтобы вызывающий код не испортил индекс
+        self._ensure_index()
+        path = os.path.abspath(params_file)
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == _signature(stat):
+                self.hits += 1
+                return dict(entry[1])
+        with open(path, 'r') as file:
+            text = file.read()
+        params = parse_params(text, os.path.basename(path))
+        with self._lock:
+            self.parses += 1
+            self._entries[path] = (_signature(stat), params)
+        return dict(params)
+
+    def names(self):
+        # Имена файлов параметров в папке; os.listdir — только когда
+        # папка изменилась
+        self._ensure_index()
+        try:
+            stat = os.stat(self.folder)
+        except OSError:
+            return []
+        with self._lock:
+            if self._names is not None and self._folder_signature == stat.st_mtime_ns:
+                return list(self._names)
+        names = sorted(name for name in os.listdir(self.folder)
+                       if name.endswith(PARAM_EXTENSIONS) and not name.startswith('.'))
+        with self._lock:
+            self._names = names
+            self._folder_signature = stat.st_mtime_ns
+        return list(names)
+
+    def all(self):
+        # {имя: параметры} для всех корректных файлов папки
+        result = {}
+        for name in self.names():
+            try:
+                result[name] = self.get(self.folder / name)
+            except Exception:
+                continue
+        return result
+
+    def refresh(self):
+        # Перечитывает список папки и возвращает разницу с предыдущим:
+        # (добавленные, удаленные, измененные) имена
+        with self._lock:
+            previous = list(self._names or [])
+            self._names = None
+        current = self.names()
+        known = set(previous)
+        added = [name for name in current if name not in known]
+        present = set(current)
+        removed = [name for name in previous if name not in present]
+        changed = []
+        folder = os.path.abspath(self.folder)
+        for name in current:
+            if name not in known:
+                continue
+            path = os.path.join(folder, name)
+            with self._lock:
+                entry = self._entries.get(path)
+            try:
+                if entry is not None and entry[0] != _signature(os.stat(path)):
+                    changed.append(name)
+            except OSError:
+                continue
+        with self._lock:
+            # Устаревшие записи разберутся заново при следующем get()
+            for name in removed + changed:
+                self._entries.pop(os.path.join(folder, name), None)
+        return added, removed, changed
+
+    def invalidate(self, params_file=None):
+        with self._lock:
+            if params_file is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(params_file), None)
+            self._names = None
+
+    def save_index(self, index_path=None):
+        # Сохраняет разобранные параметры папки в один JSON
+        index_path = index_path or self.folder / INDEX_NAME
+        self.all()
+        folder = os.path.abspath(self.folder)
+        with self._lock:
+            files = {os.path.relpath(path, folder): {'signature': list(signature), 'params': params}
+                     for path, (signature, params) in self._entries.items()
+                     if os.path.dirname(path) == folder}
+        part_path = f"{index_path}.cadc-part"
+        with open(part_path, 'w') as file:
+            json.dump({'version': INDEX_VERSION, 'files': files}, file)
+        os.replace(part_path, index_path)
+        return len(files)
+
+    def load_index(self, index_path=None):
+        # Загружает сохраненный индекс; устаревшие записи отсеет get()
+        # по mtime и размеру файла
+        index_path = index_path or self.folder / INDEX_NAME
+        try:
+            with open(index_path, 'r') as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return 0
+        if index.get('version') != INDEX_VERSION:
+            return 0
+        folder = os.path.abspath(self.folder)
+        with self._lock:
+            for name, entry in index['files'].items():
+                self._entries.setdefault(os.path.join(folder, name),
+                                         (tuple(entry['signature']), entry['params']))
+        return len(index['files'])
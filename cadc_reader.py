@@ -0,0 +1,111 @@
+import os
+import threading
+from collections import OrderedDict
+import pyzipper
+import cadc_core
+import cadc_keys
+import cadc_zip
+
+# Чтение файлов из архивов .cp без распаковки на диск.
+#
+# ArchiveReader открывает архив один раз: ключ выводится и проверяется при
+# открытии, дальше open(name) отдает ZipExtFile — потоковый файловый объект
+# с seek. Несколько элементов одного архива можно читать одновременно из
+# разных потоков: pyzipper разделяет файл архива под блокировкой.
+# seek вперед дочитывает данные, seek назад расшифровывает элемент заново
+# с начала; HMAC проверяется, когда элемент дочитан до конца.
+#
+# reader_cache держит открытые архивы между запросами и переоткрывает
+# архив, если файл изменился (например, после cadc_core.update).
+
+class ArchiveReader:
+    def __init__(self, archive_path, params_file):
+        self.archive_path = str(archive_path)
+        public_key = cadc_core.archive_key(self.archive_path, params_file)
+        stat = os.stat(self.archive_path)
+        self.signature = (stat.st_mtime_ns, stat.st_size)
+        self._zipf = pyzipper.AESZipFile(self.archive_path, 'r')
+        try:
+            self._infos = {info.filename: info for info in cadc_zip.content_infos(self._zipf)}
+            self._duplicates = cadc_core.verify_archive_key(self._zipf, public_key, list(self._infos.values()))
+        except BaseException:
+            self._zipf.close()
+            raise
+
+    def names(self):
+        return list(self._infos) + list(self._duplicates)
+
+    def info(self, name):
+        # ZipInfo элемента; для дубликата — ZipInfo оригинала
+        name = self._duplicates.get(name, name)
+        info = self._infos.get(name)
+        if info is None:
+            raise Exception(f"Файл не найден в архиве: {name}")
+        return info
+
+    def open(self, name):
+        info = self.info(name)
+        if info.is_dir():
+            raise Exception(f"Это папка, а не файл: {name}")
+        try:
+            return self._zipf.open(info)
+        except cadc_core.INTEGRITY_ERRORS:
+            raise Exception("Неверный ключ или поврежденный архив")
+
+    def read(self, name):
+        with self.open(name) as member:
+            return member.read()
+
+    def close(self):
+        # Уже открытые элементы дочитываются: pyzipper закрывает файл
+        # архива, когда закрыт последний из них
+        self._zipf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ReaderCache:
+    # Открытые ArchiveReader: (путь архива, хеш параметров) -> читатель.
+    # LRU; вытесненные и устаревшие читатели закрываются
+
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self._readers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, archive_path, params_file):
+        params = cadc_core.read_params(params_file)
+        cache_key = (os.path.realpath(archive_path), cadc_keys.params_fingerprint(params))
+        stat = os.stat(archive_path)
+        with self._lock:
+            reader = self._readers.get(cache_key)
+            if reader is not None and reader.signature == (stat.st_mtime_ns, stat.st_size):
+                self._readers.move_to_end(cache_key)
+                return reader
+            if reader is not None:
+                del self._readers[cache_key]
+                reader.close()
+        # Открываем без блокировки: вывод ключа может занять время
+        reader = ArchiveReader(archive_path, params_file)
+        with self._lock:
+            previous = self._readers.pop(cache_key, None)
+            if previous is not None:
+                previous.close()
+            self._readers[cache_key] = reader
+            while len(self._readers) > max(self.maxsize, 1):
+                self._readers.popitem(last=False)[1].close()
+        return reader
+
+    def clear(self):
+        with self._lock:
+            while self._readers:
+                self._readers.popitem()[1].close()
+
+reader_cache = ReaderCache()
+
+def open_member(archive_path, params_file, name):
+    # Потоковый файловый объект с seek для файла name внутри архива
+    return reader_cache.get(archive_path, params_file).open(name)
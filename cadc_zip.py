@@ -0,0 +1,582 @@
+import os
+import copy
+import fnmatch
+import json
+import math
+import mmap
+import shutil
+import struct
+import zlib
+from collections import deque, Counter
+from concurrent.futures import ThreadPoolExecutor
+from pyzipper.zipfile import (_get_compressor, BadZipFile, ZIP64_LIMIT, ZIP_STORED, ZIP_DEFLATED,
+                              ZIP_BZIP2, ZIP_LZMA, _MASK_ENCRYPTED, _MASK_COMPRESS_OPTION_1)
+from pyzipper.zipfile_aes import AESZipDecrypter
+import cadc_metrics
+
+# Низкоуровневая запись элементов в pyzipper.AESZipFile.
+#
+# Элемент можно подготовить целиком вне архива: сжать, зашифровать и
+# посчитать CRC (build_member), а затем одним вызовом дописать готовые
+# байты в архив (write_member). Подготовка идет в потоках: zlib, AES и
+# HMAC из pycryptodomex отпускают GIL, поэтому потоки реально грузят ядра.
+# Записывает всегда один поток и в исходном порядке, так что архив
+# получается тем же, что и при последовательном zipf.write.
+
+CHUNK_SIZE = 1024 * 1024
+# Буфер потоковой распаковки: пиковая память не зависит от размера элемента
+EXTRACT_BUFFER_SIZE = 1024 * 1024
+# Файлы крупнее этого порога не держим в памяти целиком — их пишет
+# сам писатель потоково через zipf.write, когда до них доходит очередь
+PARALLEL_MAX_MEMBER = 16 * 1024 * 1024
+# Сколько исходных байт могут одновременно готовиться и ждать записи в
+# памяти при параллельной записи, независимо от числа потоков
+PARALLEL_BUFFER_BYTES = 128 * 1024 * 1024
+
+COMPRESSION_METHODS = {
+    'stored': ZIP_STORED,
+    'deflate': ZIP_DEFLATED,
+    'bzip2': ZIP_BZIP2,
+    'lzma': ZIP_LZMA,
+}
+# Допустимые уровни сжатия; у stored и lzma уровня нет
+COMPRESSION_LEVELS = {
+    'deflate': range(0, 10),
+    'bzip2': range(1, 10),
+}
+
+# Форматы, которые уже сжаты: повторное сжатие только тратит CPU
+COMPRESSED_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.avif',
+    '.mp3', '.aac', '.m4a', '.ogg', '.opus', '.flac',
+    '.mp4', '.m4v', '.mkv', '.avi', '.mov', '.webm', '.wmv',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.txz', '.7z', '.rar', '.zst', '.lz4', '.cp',
+    '.jar', '.apk', '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp', '.epub',
+}
+ENTROPY_SAMPLE_SIZE = 64 * 1024
+# Энтропия выборки (бит на байт), начиная с которой данные считаем сжатыми
+ENTROPY_THRESHOLD = 7.5
+# Маленькие файлы не проверяем: выборка была бы дороже самого сжатия
+ENTROPY_MIN_SIZE = 4 * 1024
+
+def sample_entropy(file_path, sample_size=ENTROPY_SAMPLE_SIZE):
+    with open(file_path, 'rb') as file:
+        sample = file.read(sample_size)
+    if not sample:
+        return 0.0
+    total = len(sample)
+    return -sum(count / total * math.log2(count / total) for count in Counter(sample).values())
+
+def looks_compressed(file_path):
+    if os.path.splitext(file_path)[1].lower() in COMPRESSED_EXTENSIONS:
+        return True
+    try:
+        if os.path.getsize(file_path) < ENTROPY_MIN_SIZE:
+            return False
+        return sample_entropy(file_path) >= ENTROPY_THRESHOLD
+    except OSError:
+        return False
+
+class CompressionPolicy:
+    # Метод и уровень сжатия элементов архива. auto_store — уже сжатые
+    # данные (по расширению или энтропии выборки) кладутся без сжатия
+
+    def __init__(self, method='deflate', level=None, auto_store=False):
+        if method not in COMPRESSION_METHODS:
+            raise ValueError(f"Неизвестный метод сжатия: {method}")
+        if level is not None and level not in COMPRESSION_LEVELS.get(method, ()):
+            raise ValueError(f"Недопустимый уровень сжатия {level} для {method}")
+        self.method = method
+        self.level = level
+        self.auto_store = auto_store
+
+    @classmethod
+    def parse(cls, spec):
+        # "stored", "deflate", "deflate:1".."deflate:9", "bzip2[:N]", "lzma",
+        # "auto[:N]" — deflate с хранением уже сжатых файлов без сжатия
+        if spec is None:
+            return cls()
+        if isinstance(spec, cls):
+            return spec
+        method, _, level = spec.strip().lower().partition(':')
+        auto_store = method == 'auto'
+        if auto_store:
+            method = 'deflate'
+        try:
+            level = int(level) if level else None
+        except ValueError:
+            raise ValueError(f"Некорректный уровень сжатия: {spec}")
+        return cls(method, level, auto_store)
+
+    def choose(self, file_path):
+        # (compress_type, compresslevel) для файла
+        if self.auto_store and looks_compressed(file_path):
+            return ZIP_STORED, None
+        return COMPRESSION_METHODS[self.method], self.level
+
+# Файлы меньше этого размера с mmap читаются обычным образом: отображение
+# окупается только на больших файлах
+MMAP_MIN_SIZE = 4 * 1024 * 1024
+
+def input_chunks(file_path, use_mmap=False, chunk_size=CHUNK_SIZE):
+    # Куски файла для сжатия и шифрования. С use_mmap — срезы memoryview
+    # над отображением файла в память: данные идут в zlib и AES прямо из
+    # страничного кеша, без копий в буферы Python. Срез действителен только
+    # до следующего куска. Файл не должен укорачиваться во время чтения:
+    # обращение к пропавшим страницам отображения завершает процесс (SIGBUS)
+    with open(file_path, 'rb') as src:
+        if not use_mmap or os.fstat(src.fileno()).st_size < MMAP_MIN_SIZE:
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+        with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mapped, 'madvise'):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, len(view), chunk_size):
+                    chunk = view[offset:offset + chunk_size]
+                    try:
+                        yield chunk
+                    finally:
+                        chunk.release()
+            finally:
+                view.release()
+
+def write_file(zipf, file_path, arcname, compress_type=None, compresslevel=None, use_mmap=False,
+               on_chunk=None):
+    # Записывает файл элементом архива. Без use_mmap и on_chunk — обычный
+    # zipf.write (чтение кусками по 8 КБ), иначе кусками CHUNK_SIZE (из mmap
+    # с use_mmap). on_chunk(число байт) вызывается после каждого куска;
+    # исключение из него прерывает запись
+    if not use_mmap and on_chunk is None:
+        zipf.write(file_path, arcname, compress_type=compress_type, compresslevel=compresslevel)
+        return
+    zinfo = zipf.zipinfo_cls.from_file(file_path, arcname, strict_timestamps=zipf._strict_timestamps)
+    zinfo.compress_type = zipf.compression if compress_type is None else compress_type
+    zinfo._compresslevel = zipf.compresslevel if compresslevel is None else compresslevel
+    with zipf.open(zinfo, 'w') as dest:
+        for chunk in input_chunks(file_path, use_mmap):
+            dest.write(chunk)
+            if on_chunk:
+                on_chunk(len(chunk))
+
+def new_member_info(zipf, file_path, arcname, compress_type=None, compresslevel=None):
+    # Повторяет подготовку ZipInfo из ZipFile.write/_open_to_write
+    zinfo = zipf.zipinfo_cls.from_file(file_path, arcname, strict_timestamps=zipf._strict_timestamps)
+    zinfo.compress_type = zipf.compression if compress_type is None else compress_type
+    zinfo._compresslevel = zipf.compresslevel if compresslevel is None else compresslevel
+    zinfo.flag_bits = 0
+    encrypter = None
+    if zipf.pwd is not None or zipf.encryption is not None:
+        zinfo.flag_bits |= _MASK_ENCRYPTED
+        encrypter = zipf.get_encrypter()
+        encrypter.update_zipinfo(zinfo)
+    if zinfo.compress_type == ZIP_LZMA:
+        # Сжатые данные содержат маркер конца потока (EOS)
+        zinfo.flag_bits |= _MASK_COMPRESS_OPTION_1
+    return zinfo, encrypter
+
+def build_member(zipf, file_path, arcname, compress_type=None, compresslevel=None, use_mmap=False):
+    # Возвращает (zinfo, payload): payload — заголовок шифрования, сжатые и
+    # зашифрованные данные и HMAC, ровно то, что лежит в архиве после
+    # локального заголовка
+    zinfo, encrypter = new_member_info(zipf, file_path, arcname, compress_type, compresslevel)
+    compressor = _get_compressor(zinfo.compress_type, zinfo._compresslevel)
+    parts = []
+    if encrypter:
+        parts.append(encrypter.encryption_header())
+    crc = 0
+    file_size = 0
+    for chunk in input_chunks(file_path, use_mmap):
+        file_size += len(chunk)
+        crc = zlib.crc32(chunk, crc)
+        if compressor:
+            chunk = compressor.compress(chunk)
+        if encrypter:
+            chunk = encrypter.encrypt(chunk)
+        # Срез mmap после этого шага станет недействительным
+        parts.append(bytes(chunk) if isinstance(chunk, memoryview) else chunk)
+    tail = compressor.flush() if compressor else b''
+    if encrypter:
+        tail = encrypter.encrypt(tail) + encrypter.flush()
+    parts.append(tail)
+    payload = b''.join(parts)
+
+    zinfo.file_size = file_size
+    zinfo.compress_size = len(payload)
+    zinfo.CRC = crc
+    if encrypter:
+        encrypter.finalize_zipinfo(zinfo)
+    return zinfo, payload
+
+def write_member(zipf, zinfo, payload):
+    # Дописывает готовый элемент: локальный заголовок + payload
+    if not zipf.fp:
+        raise ValueError("Attempt to write to ZIP archive that was already closed")
+    if zipf._writing:
+        raise ValueError("Can't write to ZIP archive while an open writing handle exists")
+    with zipf._lock:
+        zip64 = zipf._allowZip64 and (zinfo.file_size * 1.05 > ZIP64_LIMIT
+                                      or zinfo.compress_size > ZIP64_LIMIT)
+        if zipf._seekable:
+            zipf.fp.seek(zipf.start_dir)
+        zinfo.header_offset = zipf.fp.tell()
+        zipf._writecheck(zinfo)
+        zipf._didModify = True
+        zipf.fp.write(zinfo.FileHeader(zip64))
+        zipf.fp.write(payload)
+        zipf.start_dir = zipf.fp.tell()
+        zipf.filelist.append(zinfo)
+        zipf.NameToInfo[zinfo.filename] = zinfo
+
+def _parallel_size(file_path, size=None):
+    # Размер файла, если его можно подготовить в памяти, иначе None.
+    # size — размер, уже известный из обхода папки
+    try:
+        if size is None:
+            size = os.path.getsize(file_path)
+    except OSError:
+        # Ошибку покажет обычная запись в порядке очереди
+        return None
+    return size if size <= PARALLEL_MAX_MEMBER else None
+
+def _write_one(zipf, file_path, arcname, policy, metrics=None, use_mmap=False, on_chunk=None):
+    # Возвращает исходный размер записанного элемента
+    if file_path is None:
+        with cadc_metrics.stage(metrics, 'write', arcname):
+            zipf.writestr(arcname, "")
+    else:
+        compress_type, compresslevel = policy.choose(file_path)
+        # pyzipper сжимает, шифрует и пишет элемент одним вызовом
+        with cadc_metrics.stage(metrics, 'compress_encrypt', arcname):
+            write_file(zipf, file_path, arcname, compress_type, compresslevel, use_mmap, on_chunk)
+    return zipf.filelist[-1].file_size
+
+def _build_with_policy(zipf, file_path, arcname, policy, metrics=None, use_mmap=False):
+    compress_type, compresslevel = policy.choose(file_path)
+    with cadc_metrics.stage(metrics, 'compress_encrypt', arcname):
+        return build_member(zipf, file_path, arcname, compress_type, compresslevel, use_mmap)
+
+def write_entries(zipf, entries, workers=1, policy=None, metrics=None, use_mmap=False, on_chunk=None):
+    # entries: (путь, имя в архиве, размер или None); путь None — пустая папка.
+    # Генератор: после записи каждого элемента отдает
+    # (путь, имя, исходный размер, ошибка). use_mmap — читать файлы через
+    # mmap (см. input_chunks). on_chunk вызывается из потока-писателя по
+    # кускам файлов, которые он пишет потоково; исключение из него
+    # (например, отмена задачи) прерывает всю запись, а не пропускает файл
+    policy = CompressionPolicy.parse(policy)
+    aborted = []
+
+    def guarded(nbytes):
+        try:
+            on_chunk(nbytes)
+        except BaseException as e:
+            aborted.append(e)
+            raise
+    tick = guarded if on_chunk is not None else None
+
+    if workers <= 1:
+        for file_path, arcname, _ in entries:
+            try:
+                size = _write_one(zipf, file_path, arcname, policy, metrics, use_mmap, tick)
+                yield file_path, arcname, size, None
+            except Exception as e:
+                if aborted:
+                    raise
+                yield file_path, arcname, 0, e
+        return
+
+    window = deque()
+    # Исходные байты элементов в окне: готовый payload примерно того же
+    # размера (сжатие не больше чем немного его увеличивает)
+    buffered = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        def flush_one():
+            nonlocal buffered
+            file_path, arcname, future, size = window.popleft()
+            buffered -= size
+            try:
+                if future is None:
+                    size = _write_one(zipf, file_path, arcname, policy, metrics, use_mmap, tick)
+                else:
+                    zinfo, payload = future.result()
+                    with cadc_metrics.stage(metrics, 'write', arcname):
+                        write_member(zipf, zinfo, payload)
+                    size = zinfo.file_size
+                return file_path, arcname, size, None
+            except Exception as e:
+                if aborted:
+                    raise
+                return file_path, arcname, 0, e
+
+        try:
+            for file_path, arcname, known_size in entries:
+                size = _parallel_size(file_path, known_size) if file_path is not None else None
+                if size is not None:
+                    # Освобождаем место в бюджете памяти до того, как
+                    # ставить в очередь следующий элемент
+                    while window and buffered + size > PARALLEL_BUFFER_BYTES:
+                        yield flush_one()
+                    future = pool.submit(_build_with_policy, zipf, file_path, arcname, policy, metrics, use_mmap)
+                    buffered += size
+                    window.append((file_path, arcname, future, size))
+                else:
+                    window.append((file_path, arcname, None, 0))
+                # Ограничиваем и число готовых, но еще не записанных элементов
+                if len(window) >= workers * 2:
+                    yield flush_one()
+            while window:
+                yield flush_one()
+        finally:
+            for _, _, future, _ in window:
+                if future is not None:
+                    future.cancel()
+
+# Служебные элементы архива (манифест инкрементального режима):
+# в список файлов и распаковку не попадают
+MANIFEST_NAME = ".cadc-manifest.json"
+# Индекс дедупликации: имя дубликата -> имя элемента с тем же содержимым
+DEDUP_INDEX_NAME = ".cadc-dedup.json"
+SERVICE_NAMES = {MANIFEST_NAME, DEDUP_INDEX_NAME}
+
+def content_infos(zipf):
+    return [info for info in zipf.infolist() if info.filename not in SERVICE_NAMES]
+
+def member_span(zipf, info):
+    # Сколько байт элемент занимает в файле: локальный заголовок, данные
+    # (для AES — с солью и HMAC) и дескриптор данных, если он есть
+    with zipf._lock:
+        zipf.fp.seek(info.header_offset)
+        header = zipf.fp.read(30)
+        if len(header) != 30 or header[:4] != b'PK\x03\x04':
+            raise BadZipFile(f"Поврежден локальный заголовок: {info.filename}")
+        name_len, extra_len = struct.unpack('<HH', header[26:30])
+        span = 30 + name_len + extra_len + info.compress_size
+        if info.flag_bits & 0x08:
+            zipf.fp.seek(info.header_offset + span)
+            signed = zipf.fp.read(4) == b'PK\x07\x08'
+            span += (16 if signed else 12) + (8 if info.compress_size > ZIP64_LIMIT else 0)
+    return span
+
+def dead_bytes(zipf):
+    # Байты до центрального каталога, не принадлежащие ни одному элементу:
+    # замененные и удаленные элементы и старые центральные каталоги
+    return zipf.start_dir - sum(member_span(zipf, info) for info in zipf.infolist())
+
+def remove_member(zipf, info):
+    # Убирает элемент из центрального каталога; его байты остаются в файле
+    # мертвым грузом до уплотнения
+    zipf.filelist.remove(info)
+    del zipf.NameToInfo[info.filename]
+    zipf._didModify = True
+
+def read_span(zipf, offset, length, name):
+    # Байты файла архива [offset, offset + length) кусками по CHUNK_SIZE;
+    # файл разделяется с другими читателями, поэтому seek под блокировкой
+    while length > 0:
+        with zipf._lock:
+            zipf.fp.seek(offset)
+            chunk = zipf.fp.read(min(CHUNK_SIZE, length))
+        if not chunk:
+            raise BadZipFile(f"Обрезан элемент: {name}")
+        yield chunk
+        offset += len(chunk)
+        length -= len(chunk)
+
+def copy_raw_member(source, target, info, on_chunk=None):
+    # Переносит элемент как есть, не расшифровывая и не распаковывая:
+    # ключ тот же, поэтому байты элемента остаются валидными
+    span = member_span(source, info)
+    new_info = copy.copy(info)
+    with target._lock:
+        if target._seekable:
+            target.fp.seek(target.start_dir)
+        new_info.header_offset = target.fp.tell()
+        target._didModify = True
+        for chunk in read_span(source, info.header_offset, span, info.filename):
+            target.fp.write(chunk)
+            if on_chunk:
+                on_chunk(len(chunk))
+        target.start_dir = target.fp.tell()
+        target.filelist.append(new_info)
+        target.NameToInfo[new_info.filename] = new_info
+    return new_info
+
+def transfer_member(source, target, info, arcname=None, source_pwd=None, on_chunk=None):
+    # Переносит элемент в другой архив без распаковки и повторного сжатия.
+    # Локальный заголовок пишется заново (arcname — новое имя элемента).
+    # source_pwd — ключ источника, когда у target другой ключ: данные
+    # расшифровываются и тут же шифруются ключом target с новой солью и
+    # HMAC, сжатый поток при этом не меняется. Без source_pwd байты данных
+    # копируются как есть
+    rekey = source_pwd is not None and info.flag_bits & _MASK_ENCRYPTED
+    if not rekey and arcname is None:
+        return copy_raw_member(source, target, info, on_chunk)
+    with source._lock:
+        source.fp.seek(info.header_offset)
+        header = source.fp.read(30)
+    if len(header) != 30 or header[:4] != b'PK\x03\x04':
+        raise BadZipFile(f"Поврежден локальный заголовок: {info.filename}")
+    name_len, extra_len = struct.unpack('<HH', header[26:30])
+    offset = info.header_offset + 30 + name_len + extra_len
+    length = info.compress_size
+
+    new_info = copy.copy(info)
+    if arcname is not None:
+        new_info.filename = new_info.orig_filename = arcname
+    # Размеры известны заранее, дескриптор данных не нужен
+    new_info.flag_bits &= ~0x08
+    decrypter = encrypter = None
+    if rekey:
+        header_len = AESZipDecrypter.encryption_header_length(info)
+        decrypter = AESZipDecrypter(info, source_pwd, b''.join(read_span(source, offset, header_len, info.filename)))
+        encrypter = target.get_encrypter()
+        encrypter.update_zipinfo(new_info)
+        offset += header_len
+        length -= header_len + decrypter.hmac_size
+        new_info.compress_size = len(encrypter.encryption_header()) + length + encrypter.hmac_size
+
+    with target._lock:
+        zip64 = target._allowZip64 and (new_info.file_size * 1.05 > ZIP64_LIMIT
+                                        or new_info.compress_size > ZIP64_LIMIT)
+        if target._seekable:
+            target.fp.seek(target.start_dir)
+        new_info.header_offset = target.fp.tell()
+        target._writecheck(new_info)
+        target._didModify = True
+        target.fp.write(new_info.FileHeader(zip64))
+        if encrypter:
+            target.fp.write(encrypter.encryption_header())
+        for chunk in read_span(source, offset, length, info.filename):
+            if encrypter:
+                chunk = encrypter.encrypt(decrypter.decrypt(chunk))
+            target.fp.write(chunk)
+            if on_chunk:
+                on_chunk(len(chunk))
+        if encrypter:
+            # HMAC источника проверяем до того, как элемент попадет в каталог
+            decrypter.check_hmac(b''.join(read_span(source, offset + length, decrypter.hmac_size,
+                                                    info.filename)))
+            target.fp.write(encrypter.flush())
+        target.start_dir = target.fp.tell()
+        target.filelist.append(new_info)
+        target.NameToInfo[new_info.filename] = new_info
+    return new_info
+
+def check_password(zipf, infos):
+    # Быстрая проверка ключа по верификатору WZ_AES первого файла: PBKDF2 и
+    # сравнение двух байт, без расшифровки данных. Окончательно ключ
+    # подтверждает HMAC при распаковке
+    for info in infos:
+        if info.is_dir():
+            continue
+        try:
+            with zipf.open(info):
+                pass
+        except RuntimeError:
+            return False
+        return True
+    return True
+
+def member_target_path(zipf, member, extract_path):
+    # Та же очистка имени, что и в ZipFile._extract_member
+    arcname = member.filename.replace('/', os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    invalid_path_parts = ('', os.path.curdir, os.path.pardir)
+    arcname = os.path.sep.join(x for x in arcname.split(os.path.sep)
+                               if x not in invalid_path_parts)
+    if os.path.sep == '\\':
+        # Недопустимые в Windows символы
+        arcname = zipf._sanitize_windows_name(arcname, os.path.sep)
+    return os.path.normpath(os.path.join(extract_path, arcname))
+
+def copy_stream(source, target, buffer_size=EXTRACT_BUFFER_SIZE, on_chunk=None):
+    # Копирование фиксированными порциями: ZipExtFile.read(n) расшифровывает
+    # и распаковывает не больше, чем нужно для n байт
+    copied = 0
+    while True:
+        chunk = source.read(buffer_size)
+        if not chunk:
+            break
+        target.write(chunk)
+        copied += len(chunk)
+        if on_chunk:
+            on_chunk(len(chunk))
+    return copied
+
+def _parent_dirs(name):
+    parts = name.split('/')[:-1]
+    return ['/'.join(parts[:index]) for index in range(1, len(parts) + 1)]
+
+def match_members(names, patterns):
+    # Имена, подходящие хотя бы под один шаблон. Шаблон — путь: сам элемент
+    # или все, что лежит внутри такой папки. Если по пути ничего нет, а в
+    # шаблоне есть знаки *?[ — это glob (fnmatch, с учетом регистра).
+    # Точное имя важнее glob: выбранный в GUI "photo[1].jpg" — это файл
+    # photo[1].jpg, а не photo1.jpg
+    names = list(names)
+    known = set(names)
+    for name in names:
+        known.update(_parent_dirs(name))
+    paths = set()
+    globs = []
+    for pattern in patterns:
+        pattern = pattern.replace(os.sep, '/')
+        path = pattern.rstrip('/')
+        if path in known:
+            paths.add(path)
+        elif any(char in pattern for char in '*?['):
+            globs.append(pattern)
+    selected = []
+    for name in names:
+        if name in paths or any(parent in paths for parent in _parent_dirs(name)) \
+                or any(fnmatch.fnmatchcase(name, pattern) for pattern in globs):
+            selected.append(name)
+    return selected
+
+def read_dedup_index(zipf):
+    if DEDUP_INDEX_NAME not in zipf.NameToInfo:
+        return {}
+    return json.loads(zipf.read(DEDUP_INDEX_NAME))
+
+def restore_duplicate(zipf, name, original, extract_path):
+    # Копирует уже распакованный оригинал под именем дубликата
+    source_path = member_target_path(zipf, zipf.getinfo(original), extract_path)
+    target_path = member_target_path(zipf, zipf.zipinfo_cls(name), extract_path)
+    upperdirs = os.path.dirname(target_path)
+    if upperdirs and not os.path.exists(upperdirs):
+        os.makedirs(upperdirs)
+    shutil.copyfile(source_path, target_path)
+    return os.path.getsize(target_path)
+
+def extract_member(zipf, member, extract_path, buffer_size=EXTRACT_BUFFER_SIZE, on_chunk=None, name=None):
+    # Распаковка за один проход: данные расшифровываются и распаковываются
+    # один раз, потоково; CRC и HMAC проверяются в конце элемента. Файл
+    # пишется во временный и переименовывается только после проверки.
+    # name — распаковать под другим именем (дубликат из индекса)
+    target = member if name is None else zipf.zipinfo_cls(name)
+    targetpath = member_target_path(zipf, target, extract_path)
+    upperdirs = os.path.dirname(targetpath)
+    if upperdirs and not os.path.exists(upperdirs):
+        os.makedirs(upperdirs)
+
+    if member.is_dir():
+        if not os.path.isdir(targetpath):
+            os.mkdir(targetpath)
+        return targetpath
+
+    part_path = targetpath + ".cadc-part"
+    try:
+        with zipf.open(member) as source, open(part_path, "wb") as target:
+            copy_stream(source, target, buffer_size, on_chunk)
+        os.replace(part_path, targetpath)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return targetpath
@@ -0,0 +1,56 @@
+# Свойства кодека цифр: обратимость, пакетное декодирование, имена архивов
+import random
+
+import pytest
+
+import cadc_codec
+import cadc_core
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_verify_codec(seed):
+    assert cadc_codec.verify_codec(samples=5000, seed=seed) == []
+
+
+@pytest.mark.parametrize("key_len", [1, 3, 7, 35, 63])
+def test_odd_key_len_round_trip(key_len):
+    # Нечетная строка кодируется с ведущим нулем, который декодер убирает
+    rng = random.Random(key_len)
+    for _ in range(2000):
+        digits = str(rng.randint(1, 9)) + ''.join(rng.choice('0123456789') for _ in range(key_len - 1))
+        encoded = cadc_codec.encode_numbers(digits)
+        decoded = cadc_codec.decode_numbers(encoded)
+        assert cadc_codec.encode_numbers(decoded) == encoded
+        if cadc_codec.parse_count(encoded) == 1:
+            assert decoded == digits
+
+
+def test_decode_many_matches_decode_numbers():
+    rng = random.Random(0)
+    numbers = [''.join(rng.choice('0123456789') for _ in range(rng.randint(1, 64))) for _ in range(2000)]
+    encoded = cadc_codec.encode_many(numbers)
+    assert encoded == [cadc_codec.encode_numbers(number) for number in numbers]
+    assert cadc_codec.decode_many(encoded) == [cadc_codec.decode_numbers(name) for name in encoded]
+
+
+@pytest.mark.parametrize("batch", [
+    ["AB" + cadc_codec.BATCH_SEPARATOR + "CD", "EF"],
+    [cadc_codec.BATCH_SEPARATOR, "", "KL"],
+    ["", ""],
+    [cadc_codec.BATCH_SEPARATOR * 3],
+])
+def test_decode_many_with_separator_in_names(batch):
+    # По одному результату на вход, как при декодировании по одному
+    assert cadc_codec.decode_many(batch) == [cadc_codec.decode_numbers(name) for name in batch]
+
+
+def test_decode_many_empty():
+    assert cadc_codec.decode_many([]) == []
+
+
+def test_generate_ok_round_trips():
+    random.seed(0)
+    for _ in range(2000):
+        ok_str = cadc_core.generate_ok()
+        assert cadc_codec.round_trips(ok_str.replace(".", ""))
+        assert cadc_core.archive_name_to_ok(cadc_core.ok_to_archive_name(ok_str)) == ok_str
@@ -0,0 +1,40 @@
+# Совместимость ключей: каждый бэкенд дает те же ключи, что исходный pow
+# (cadc_key_corpus.json). Decimal медленный на prec ~4000+, поэтому для него
+# берется срез: все случаи до prec 1000 и по одному большому каждого режима
+import pytest
+
+import cadc_keys
+
+CORPUS = cadc_keys.load_key_corpus()
+
+
+def decimal_slice(corpus):
+    cases = [case for case in corpus if case['prec'] <= 1000]
+    for mode in ('archive', 'public'):
+        cases.append(min((case for case in corpus if case['prec'] > 1000 and case['mode'] == mode),
+                         key=lambda case: case['prec']))
+    return cases
+
+
+def engine(backend):
+    if backend != 'decimal':
+        pytest.importorskip(backend)
+    return cadc_keys.KeyEngine(backend)
+
+
+def case_id(case):
+    return f"{case['mode']}-prec{case['prec']}-OK{case['OK']}"
+
+
+@pytest.mark.parametrize("backend", ['gmpy2', 'mpmath'])
+@pytest.mark.parametrize("case", CORPUS, ids=case_id)
+def test_corpus_binary_backends(backend, case):
+    key = engine(backend).derive(case['PK'], cadc_keys.corpus_exponent(case), case['prec'], case['key_len'])
+    assert key == case['key']
+
+
+@pytest.mark.parametrize("case", decimal_slice(CORPUS), ids=case_id)
+def test_corpus_decimal(case):
+    key = engine('decimal').derive(case['PK'], cadc_keys.corpus_exponent(case), case['prec'], case['key_len'])
+    assert key == case['key']
+
@@ -0,0 +1,19 @@
+# Потоковая распаковка: пиковый RSS не растет вместе с размером элемента
+import importlib.util
+
+import pytest
+
+import cadc_bench
+import cadc_zip
+
+MB = cadc_bench.MB
+
+
+@pytest.mark.skipif(importlib.util.find_spec("resource") is None,
+                    reason="замер RSS требует модуль resource (Unix)")
+def test_unpack_rss_stays_flat(tmp_path):
+    # Несжимаемые данные: элемент в архиве действительно 16 и 160 МБ
+    small = cadc_bench.measure_unpack_rss(16 * MB, cadc_zip.EXTRACT_BUFFER_SIZE, tmp_path)
+    large = cadc_bench.measure_unpack_rss(160 * MB, cadc_zip.EXTRACT_BUFFER_SIZE, tmp_path)
+    assert large - small <= cadc_bench.RSS_TOLERANCE, \
+        f"RSS вырос на {(large - small) / MB:.1f} МБ при росте элемента на 144 МБ"